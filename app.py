@@ -5,14 +5,26 @@ Grade 10 NCERT (Physics, Chemistry, Maths)
 
 import streamlit as st
 from pathlib import Path
+import os
 import sys
 from datetime import datetime
 
 # Add src to Python path
 sys.path.append(str(Path(__file__).parent / "src"))
-from chains.tutor_chain import AITutor as tutor_Chain
+# Only lightweight modules here - the model stack is loaded by TutorPreloader
+from profiling.startup_profiler import profiler
+from chains.tutor_loader import TutorPreloader
+from chains.answer_cache import SAMPLE_QUESTIONS
 from memory.user_database import UserDatabase
+from memory.retention import RetentionScheduler
 from safety.content_filter import ContentFilter  
+from server.client import TutorClient, RemoteUserDatabase
+
+# When set, this app is a thin UI client of a separate tutoring API server
+TUTOR_API_URL = os.getenv("TUTOR_API_URL")
+
+# Messages rendered per rerun / loaded per "Load earlier" click
+CHAT_PAGE_SIZE = int(os.getenv("CHAT_PAGE_SIZE", 20))
 
 st.set_page_config(
     page_title="AI Tutor - Grade 10 NCERT",
@@ -164,9 +176,29 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+@st.cache_resource(show_spinner=False)
+def get_tutor_preloader():
+    """One preloader per process: model, index and LLM client are shared by all sessions."""
+    preloader = TutorPreloader()
+    preloader.start()
+    return preloader
+
+
+@st.cache_resource(show_spinner=False)
+def get_retention_scheduler():
+    """One archival/vacuum schedule per process for the local users.db (RETENTION_INTERVAL_HOURS)."""
+    return RetentionScheduler(UserDatabase()).start()
+
+
+# Start loading the model stack in the background while the login screen renders
+# (not needed when the model runs in the API server)
+tutor_preloader = None if TUTOR_API_URL else get_tutor_preloader()
+if not TUTOR_API_URL:
+    get_retention_scheduler()
+
 # Initialize database and content filter
 if "db" not in st.session_state:
-    st.session_state.db = UserDatabase()
+    st.session_state.db = RemoteUserDatabase(TUTOR_API_URL) if TUTOR_API_URL else UserDatabase()
     st.session_state.content_filter = ContentFilter()
 
 # User Authentication
@@ -187,25 +219,61 @@ if "user_id" not in st.session_state:
             st.error("Please enter your name!")
     
     st.markdown("</div>", unsafe_allow_html=True)
+    profiler.mark("login screen rendered")
     st.stop()
 
 # Initialize tutor and load history
 if "tutor" not in st.session_state:
     with st.spinner("Initializing AI Tutor..."):
-        st.session_state.tutor = tutor_Chain()
-    
-    # Load previous conversation
-    history = st.session_state.db.get_user_history(st.session_state.user_id)
-    st.session_state.messages = [{"role": msg["role"], "content": msg["content"]} for msg in history]
+        try:
+            if TUTOR_API_URL:
+                st.session_state.tutor = TutorClient(TUTOR_API_URL, st.session_state.user_id)
+            else:
+                st.session_state.tutor = tutor_preloader.create_tutor()
+        except Exception as e:
+            # A failed load is stored on the cached preloader; drop it so the next rerun retries
+            if tutor_preloader is not None and tutor_preloader.failed():
+                get_tutor_preloader.clear()
+            st.error(f"AI Tutor failed to start: {e}")
+            st.stop()
+    
+    # Load the latest page of the previous conversation; older pages load on demand
+    history = st.session_state.db.get_user_history_page(st.session_state.user_id, limit=CHAT_PAGE_SIZE)
+    st.session_state.messages = history
+    st.session_state.render_window = CHAT_PAGE_SIZE
+    st.session_state.has_earlier = len(history) == CHAT_PAGE_SIZE
     st.session_state.conversation_started = len(history) > 0  # Fixed: initialize this variable
 
+
+def save_chat_message(role, content):
+    """Persist a message, show it in the chat and keep the cached stats current."""
+    message_id = st.session_state.db.save_message(st.session_state.user_id, role, content)
+    st.session_state.messages.append({"id": message_id, "role": role, "content": content})
+    if "stats" in st.session_state:
+        st.session_state.stats["total_messages"] += 1
+
+
+def load_earlier_messages():
+    """Widen the window, fetching the previous page from the database when needed."""
+    hidden = len(st.session_state.messages) - st.session_state.render_window
+    if hidden < CHAT_PAGE_SIZE and st.session_state.has_earlier:
+        oldest_id = st.session_state.messages[0]["id"] if st.session_state.messages else None
+        page = st.session_state.db.get_user_history_page(
+            st.session_state.user_id, limit=CHAT_PAGE_SIZE, before_id=oldest_id
+        )
+        st.session_state.messages = page + st.session_state.messages
+        st.session_state.has_earlier = len(page) == CHAT_PAGE_SIZE
+    st.session_state.render_window += CHAT_PAGE_SIZE
+
+
 # Sidebar
 with st.sidebar:
     st.title(f"{st.session_state.username}")
     
-    # User stats
-    stats = st.session_state.db.get_user_stats(st.session_state.user_id)
-    st.metric("Total Messages", stats["total_messages"])
+    # User stats (queried once per session, then updated as messages are saved)
+    if "stats" not in st.session_state:
+        st.session_state.stats = st.session_state.db.get_user_stats(st.session_state.user_id)
+    st.metric("Total Messages", st.session_state.stats["total_messages"])
     
     st.markdown("---")
     
@@ -250,15 +318,7 @@ with st.sidebar:
     
     # Sample questions
     st.header("Try These")
-    sample_questions = [
-        "What is the quadratic formula?",
-        "Explain laws of reflection",
-        "Types of chemical reactions?",
-        "How do concave mirrors work?",
-        "Solve: x² - 5x + 6 = 0"
-    ]
-
-    for q in sample_questions:
+    for q in SAMPLE_QUESTIONS:
         if st.button(q, key=f"sample_{q[:15]}", use_container_width=True):
             st.session_state.selected_question = q
     
@@ -280,6 +340,9 @@ with st.sidebar:
         st.session_state.db.clear_user_history(st.session_state.user_id)
         st.session_state.tutor.clear_history()
         st.session_state.messages = []
+        st.session_state.render_window = CHAT_PAGE_SIZE
+        st.session_state.has_earlier = False
+        st.session_state.pop("stats", None)
         st.session_state.conversation_started = False
         st.rerun()
     
@@ -311,8 +374,12 @@ if not st.session_state.conversation_started:
     Let's start learning! 
     """)
 
-# Display chat history
-for message in st.session_state.messages:
+# Display chat history - only the most recent window is rendered on each rerun
+hidden_count = len(st.session_state.messages) - st.session_state.render_window
+if hidden_count > 0 or st.session_state.has_earlier:
+    st.button("Load earlier messages", on_click=load_earlier_messages, use_container_width=True)
+
+for message in st.session_state.messages[-st.session_state.render_window:]:
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
 
@@ -339,8 +406,7 @@ if prompt:
         st.stop()
     
     # Display user message
-    st.session_state.messages.append({"role": "user", "content": prompt})
-    st.session_state.db.save_message(st.session_state.user_id, "user", prompt)
+    save_chat_message("user", prompt)
     
     with st.chat_message("user"):
         st.markdown(prompt)
@@ -355,8 +421,7 @@ if prompt:
                 response = st.session_state.content_filter.add_safety_context(response)
                 
                 st.markdown(response)
-                st.session_state.messages.append({"role": "assistant", "content": response})
-                st.session_state.db.save_message(st.session_state.user_id, "assistant", response)
+                save_chat_message("assistant", response)
             else:
                 error_msg = "Error processing your question. Please try again."
                 st.markdown(error_msg)
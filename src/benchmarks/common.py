@@ -0,0 +1,68 @@
+"""
+AI Tutor - Benchmark Helpers
+Question corpus and measurement helpers shared by the benchmarks. Kept free of
+model imports so a benchmark's memory baseline only reflects what it loads itself.
+"""
+
+import sys
+import statistics
+
+# Multi-turn conversations students draw from (first question starts a topic,
+# the rest are follow-ups that exercise conversational memory)
+DEFAULT_CONVERSATIONS = [
+    [
+        "What is a quadratic equation?",
+        "Can you give me an example with numbers?",
+        "How do I solve it using the quadratic formula?",
+    ],
+    [
+        "What is the quadratic formula?",
+        "Solve: x² - 5x + 6 = 0",
+        "What does the discriminant tell us?",
+    ],
+    [
+        "Explain laws of reflection",
+        "How do concave mirrors work?",
+        "What is the mirror formula?",
+    ],
+    [
+        "How does image formation by spherical mirrors occur?",
+        "What happens when the object is at the focus?",
+        "Can you explain it with a ray diagram?",
+    ],
+    [
+        "Types of chemical reactions?",
+        "Give an example of a displacement reaction",
+        "How do I balance a chemical equation?",
+    ],
+    [
+        "What is a combination reaction?",
+        "Why is respiration an exothermic reaction?",
+        "Who created you?",
+    ],
+]
+
+
+def current_rss_mb():
+    """Resident set size of this process in MB."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+
+    import resource
+    # Peak RSS (KB on Linux, bytes on macOS) - best effort fallback
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def percentile(values, pct):
+    """Percentile (0-100) of a list of values."""
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[pct - 1]
@@ -0,0 +1,128 @@
+"""
+AI Tutor - Embedding Backend Parity & Benchmark
+Compares the ONNX Runtime backend against the PyTorch sentence-transformers model:
+cosine drift of query vectors, recall@k on the FAISS index, query latency and memory.
+
+Usage:
+    python src/benchmarks/embedding_parity.py --k 5 [--no-quantize] [--threads 2]
+"""
+
+import sys
+import json
+import time
+import argparse
+import statistics
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent))
+from benchmarks.common import DEFAULT_CONVERSATIONS, current_rss_mb, percentile
+from chains.answer_cache import CURATED_QUESTIONS
+from retrieval.embeddings import create_embeddings
+from retrieval.query_vectorstore import VECTOR_STORE_DIR
+
+
+def parity_queries(path=None):
+    """Evaluation queries: curated questions + load test conversations, or a file (one per line)."""
+    if path:
+        return [line.strip() for line in Path(path).read_text(encoding="utf-8").splitlines() if line.strip()]
+
+    queries = list(CURATED_QUESTIONS)
+    for conversation in DEFAULT_CONVERSATIONS:
+        queries.extend(q for q in conversation if q not in queries)
+    return queries
+
+
+def load_backend(backend, **kwargs):
+    """Load a backend and measure load time and RSS growth."""
+    rss_before = current_rss_mb()
+    start = time.perf_counter()
+    embeddings = create_embeddings(backend, **kwargs)
+    embeddings.embed_query("warm up")  # First call allocates buffers / JIT
+    return embeddings, {
+        "load_s": time.perf_counter() - start,
+        "rss_growth_mb": current_rss_mb() - rss_before,
+    }
+
+
+def time_queries(embeddings, queries, repeats=3):
+    """Per-query embedding latency (one query at a time, like retrieval)."""
+    latencies = []
+    for _ in range(repeats):
+        for query in queries:
+            start = time.perf_counter()
+            embeddings.embed_query(query)
+            latencies.append(time.perf_counter() - start)
+    return {
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+    }
+
+
+def recall_at_k(index, reference, candidate, k):
+    """Overlap of FAISS top-k ids for reference vs candidate query vectors."""
+    _, ref_ids = index.search(reference, k)
+    _, cand_ids = index.search(candidate, k)
+    recalls = [len(set(r) & set(c)) / k for r, c in zip(ref_ids, cand_ids)]
+    return statistics.fmean(recalls)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare ONNX and PyTorch query embeddings")
+    parser.add_argument("--queries", help="Text file with one query per line")
+    parser.add_argument("--k", type=int, default=5, help="k for recall@k")
+    parser.add_argument("--no-quantize", action="store_true", help="Use the fp32 ONNX model")
+    parser.add_argument("--threads", type=int, help="ONNX Runtime intra-op threads")
+    parser.add_argument("--json", dest="json_path", help="Write the report to this file")
+    args = parser.parse_args()
+
+    queries = parity_queries(args.queries)
+    print(f"Comparing embedding backends on {len(queries)} queries...")
+
+    # ONNX first, so its memory is measured before torch is imported
+    onnx_embeddings, onnx_load = load_backend(
+        "onnx", quantize=not args.no_quantize, num_threads=args.threads
+    )
+    hf_embeddings, hf_load = load_backend("huggingface")
+
+    reference = np.asarray(hf_embeddings.embed_documents(queries), dtype=np.float32)
+    candidate = np.asarray(onnx_embeddings.embed_documents(queries), dtype=np.float32)
+
+    cosines = (reference * candidate).sum(axis=1) / (
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+    )
+
+    import faiss
+    index = faiss.read_index(str(Path(VECTOR_STORE_DIR) / "index.faiss"))
+
+    report = {
+        "queries": len(queries),
+        "onnx_model": str(onnx_embeddings.model_file),
+        "cosine_mean": float(cosines.mean()),
+        "cosine_min": float(cosines.min()),
+        f"recall_at_{args.k}": recall_at_k(index, reference, candidate, args.k),
+        "huggingface": {**hf_load, **time_queries(hf_embeddings, queries)},
+        "onnx": {**onnx_load, **time_queries(onnx_embeddings, queries)},
+    }
+
+    print("\n" + "=" * 80)
+    print("EMBEDDING BACKEND PARITY")
+    print("=" * 80)
+    print(f"ONNX model: {report['onnx_model']}")
+    print(f"Cosine similarity to PyTorch: mean {report['cosine_mean']:.5f}, min {report['cosine_min']:.5f}")
+    print(f"Recall@{args.k} vs PyTorch on the FAISS index: {report[f'recall_at_{args.k}']:.3f}")
+    for name in ("huggingface", "onnx"):
+        r = report[name]
+        print(f"{name:>12}: load {r['load_s']:.2f}s | RSS +{r['rss_growth_mb']:.0f} MB | "
+              f"query mean {r['mean_ms']:.2f} ms, p50 {r['p50_ms']:.2f} ms, p95 {r['p95_ms']:.2f} ms")
+    print("=" * 80)
+
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps(report, indent=4), encoding="utf-8")
+        print(f"Report written to {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
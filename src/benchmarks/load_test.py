@@ -0,0 +1,269 @@
+"""
+AI Tutor - Concurrent Student Load Test
+Simulates N students running the full tutoring pipeline end to end:
+create_user -> content filter -> retrieval + LLM (AITutor.ask) -> save_message
+
+Usage:
+    python src/benchmarks/load_test.py --students 50 --concurrency 10 --turns 3
+
+Fault injection (fake backend): FAKE_LLM_FAILURE_RATE=0.3 FAKE_LLM_HANG_RATE=0.1 with a
+small LLM_TIMEOUT / ASK_DEADLINE shows bounded latency and degraded answers in the report.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import statistics
+import threading
+import tracemalloc
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(str(Path(__file__).parent.parent))
+from chains.tutor_chain import AITutor
+from chains.llm_backends import create_llm
+from chains.single_flight import SingleFlight
+from chains.resilience import CircuitBreaker
+from memory.user_database import UserDatabase
+from retrieval.query_vectorstore import VectorStoreRetriever
+from safety.content_filter import ContentFilter
+from benchmarks.common import DEFAULT_CONVERSATIONS, current_rss_mb, percentile
+
+
+def load_conversations(path):
+    """
+    Load a question corpus.
+    JSON: list of conversations (each a list of questions) or a flat list of questions.
+    Text: one question per line, blank lines separate conversations.
+    """
+    if not path:
+        return DEFAULT_CONVERSATIONS
+
+    text = Path(path).read_text(encoding="utf-8")
+
+    if path.endswith(".json"):
+        data = json.loads(text)
+        return [c if isinstance(c, list) else [c] for c in data]
+
+    conversations = []
+    for block in text.split("\n\n"):
+        questions = [line.strip() for line in block.splitlines() if line.strip()]
+        if questions:
+            conversations.append(questions)
+    return conversations
+
+
+class LoadTest:
+    """Runs simulated student sessions against shared model resources."""
+
+    def __init__(self, conversations, turns=3, think_time=1.0, db_path=None,
+                 llm=None, retriever=None, seed=None):
+        self.conversations = conversations
+        self.turns = turns
+        self.think_time = think_time
+        self.rng = random.Random(seed)
+        self.run_id = int(time.time())
+
+        self.db = UserDatabase(db_path=db_path)
+        self.content_filter = ContentFilter()
+
+        # Shared across sessions, like one warm app instance
+        self.llm = llm or create_llm()
+        self.retriever = retriever or VectorStoreRetriever()
+        self.single_flight = SingleFlight()
+        self.circuit_breaker = CircuitBreaker()
+
+        self.lock = threading.Lock()
+        self.sessions = []
+        self.turn_latencies = []
+        self.ask_latencies = []
+        self.errors = 0
+        self.filtered = 0
+        self.degraded = 0
+
+    def _pick_conversation(self):
+        with self.lock:
+            conversation = self.rng.choice(self.conversations)
+            think = [self.rng.uniform(0.5, 1.5) * self.think_time for _ in range(self.turns)]
+        # Cycle through the conversation if it is shorter than the requested turns
+        questions = [conversation[i % len(conversation)] for i in range(self.turns)]
+        return questions, think
+
+    def run_student(self, student_index):
+        """One student session: login, then a multi-turn conversation."""
+        user_id = self.db.create_user(f"loadtest_{self.run_id}_{student_index}")
+        tutor = AITutor(llm=self.llm, retriever=self.retriever,
+                        single_flight=self.single_flight, circuit_breaker=self.circuit_breaker)
+
+        with self.lock:
+            # Keep sessions alive until the end, as Streamlit would
+            self.sessions.append(tutor)
+
+        questions, think = self._pick_conversation()
+
+        for question, pause in zip(questions, think):
+            time.sleep(pause)
+            turn_start = time.perf_counter()
+
+            is_safe, _ = self.content_filter.is_safe(question)
+            if not is_safe:
+                with self.lock:
+                    self.filtered += 1
+                continue
+
+            self.db.save_message(user_id, "user", question)
+
+            ask_start = time.perf_counter()
+            answer = tutor.ask(question)
+            ask_latency = time.perf_counter() - ask_start
+
+            if answer is None:
+                with self.lock:
+                    self.errors += 1
+                continue
+
+            if tutor.last_response_degraded:
+                with self.lock:
+                    self.degraded += 1
+
+            answer = self.content_filter.add_safety_context(answer)
+            self.db.save_message(user_id, "assistant", answer)
+
+            with self.lock:
+                self.ask_latencies.append(ask_latency)
+                self.turn_latencies.append(time.perf_counter() - turn_start)
+
+    def run(self, students, concurrency, trace_memory=False):
+        """Run all student sessions and return the report dict."""
+        base_rss = current_rss_mb()
+        if trace_memory:
+            tracemalloc.start()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = [pool.submit(self.run_student, i) for i in range(students)]
+            for future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"Student session failed: {e}")
+                    with self.lock:
+                        self.errors += 1
+        wall_time = time.perf_counter() - start
+
+        traced_per_session = None
+        if trace_memory:
+            traced_current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            traced_per_session = traced_current / 1024 / max(len(self.sessions), 1)
+
+        rss_growth = current_rss_mb() - base_rss
+        completed = len(self.turn_latencies)
+
+        return {
+            "students": students,
+            "concurrency": concurrency,
+            "turns_per_student": self.turns,
+            "think_time_s": self.think_time,
+            "completed_turns": completed,
+            "errors": self.errors,
+            "filtered": self.filtered,
+            "degraded": self.degraded,
+            "wall_time_s": wall_time,
+            "throughput_turns_per_s": completed / wall_time if wall_time else 0.0,
+            "ask_latency_s": self._latency_summary(self.ask_latencies),
+            "turn_latency_s": self._latency_summary(self.turn_latencies),
+            "rss_base_mb": base_rss,
+            "rss_growth_mb": rss_growth,
+            "rss_per_session_kb": rss_growth * 1024 / max(len(self.sessions), 1),
+            "traced_per_session_kb": traced_per_session,
+            "single_flight": self.single_flight.stats(),
+            "llm_circuit": self.circuit_breaker.stats(),
+        }
+
+    @staticmethod
+    def _latency_summary(values):
+        return {
+            "mean": statistics.fmean(values) if values else 0.0,
+            "p50": percentile(values, 50),
+            "p90": percentile(values, 90),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+            "max": max(values) if values else 0.0,
+        }
+
+
+def print_report(report):
+    print("\n" + "=" * 80)
+    print("LOAD TEST REPORT")
+    print("=" * 80)
+    print(f"Students: {report['students']} (concurrency {report['concurrency']}, "
+          f"{report['turns_per_student']} turns, think time {report['think_time_s']}s)")
+    print(f"Completed turns: {report['completed_turns']} | Errors: {report['errors']} "
+          f"| Filtered: {report['filtered']} | Degraded (textbook-only): {report['degraded']}")
+    print(f"Wall time: {report['wall_time_s']:.2f}s | "
+          f"Throughput: {report['throughput_turns_per_s']:.2f} turns/s")
+
+    for name in ("ask_latency_s", "turn_latency_s"):
+        lat = report[name]
+        print(f"{name:>15}: mean {lat['mean']:.3f} | p50 {lat['p50']:.3f} | p90 {lat['p90']:.3f} "
+              f"| p95 {lat['p95']:.3f} | p99 {lat['p99']:.3f} | max {lat['max']:.3f}")
+
+    print(f"Memory: base RSS {report['rss_base_mb']:.1f} MB, growth {report['rss_growth_mb']:.1f} MB "
+          f"(~{report['rss_per_session_kb']:.1f} KB/session)")
+    flights = report["single_flight"]
+    print(f"Coalescing: {flights['executed']} retrieval/generation calls run, "
+          f"{flights['coalesced']} saved by joining identical questions in flight")
+    circuit = report["llm_circuit"]
+    print(f"LLM circuit: {circuit['state']} | calls rejected while open: {circuit['rejected']}")
+    if report["traced_per_session_kb"] is not None:
+        print(f"Python heap per session (tracemalloc): {report['traced_per_session_kb']:.1f} KB")
+    print("=" * 80)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent student load test for AI Tutor")
+    parser.add_argument("--students", type=int, default=20, help="Number of simulated students")
+    parser.add_argument("--concurrency", type=int, default=5, help="Students active at once")
+    parser.add_argument("--turns", type=int, default=3, help="Questions per student")
+    parser.add_argument("--think-time", type=float, default=1.0,
+                        help="Mean pause before each question in seconds")
+    parser.add_argument("--questions", help="Question corpus (.json or text file)")
+    parser.add_argument("--llm-backend", default=os.getenv("LLM_BACKEND", "fake"),
+                        help="LLM backend (default: fake)")
+    parser.add_argument("--db-path", help="SQLite file for test users (default: temporary)")
+    parser.add_argument("--seed", type=int, help="Random seed for reproducible runs")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Measure Python heap per session with tracemalloc (slower)")
+    parser.add_argument("--json", dest="json_path", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    db_path = args.db_path or os.path.join(tempfile.mkdtemp(prefix="ai_tutor_load_"), "users.db")
+
+    print("=" * 80)
+    print("AI TUTOR - LOAD TEST")
+    print("=" * 80)
+    print(f"LLM backend: {args.llm_backend} | Test database: {db_path}")
+
+    load_test = LoadTest(
+        conversations=load_conversations(args.questions),
+        turns=args.turns,
+        think_time=args.think_time,
+        db_path=db_path,
+        llm=create_llm(args.llm_backend),
+        seed=args.seed,
+    )
+    report = load_test.run(args.students, args.concurrency, trace_memory=args.trace_memory)
+    print_report(report)
+
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps(report, indent=4), encoding="utf-8")
+        print(f"Report written to {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
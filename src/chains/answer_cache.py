@@ -0,0 +1,288 @@
+"""
+AI Tutor - Precomputed Answer Cache
+Warm-up job that precomputes embeddings, retrieved contexts and answers for
+curated questions (sidebar samples, common syllabus questions) so AITutor can
+serve them instantly. Entries are versioned against the vector store build.
+
+Usage (offline):
+    python src/chains/answer_cache.py [--questions curated.json] [--regenerate]
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import threading
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+ANSWER_CACHE_DIR = PROJECT_ROOT / "data" / "answer_cache"
+
+# Only serve answers a teacher marked as vetted (generated ones start unvetted)
+REQUIRE_VETTED = os.getenv("ANSWER_CACHE_REQUIRE_VETTED", "0") == "1"
+
+# Generated answers from these LLM types are never served (offline stand-ins)
+UNSERVABLE_LLM_TYPES = ("fake-tutor",)
+
+# Questions shown as sidebar buttons in app.py
+SAMPLE_QUESTIONS = [
+    "What is the quadratic formula?",
+    "Explain laws of reflection",
+    "Types of chemical reactions?",
+    "How do concave mirrors work?",
+    "Solve: x² - 5x + 6 = 0",
+]
+
+# Common syllabus questions warmed up alongside the samples
+CURATED_QUESTIONS = SAMPLE_QUESTIONS + [
+    "What is a quadratic equation?",
+    "What is the standard form of a quadratic equation?",
+    "What is the discriminant of a quadratic equation?",
+    "What is the mirror formula?",
+    "How does image formation by spherical mirrors occur?",
+    "What is the difference between concave and convex mirrors?",
+    "What is a balanced chemical equation?",
+    "What is a combination reaction?",
+    "What is a displacement reaction?",
+    "What are oxidation and reduction?",
+]
+
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize_question(question):
+    """Canonical form used as the cache key (case, spacing and end punctuation ignored)."""
+    question = _WHITESPACE_PATTERN.sub(" ", question.strip().lower())
+    return question.rstrip("?.! ")
+
+
+def load_curated_questions(path=None):
+    """
+    Load the warm-up list.
+    JSON entries may be plain questions or {"question": ..., "answer": ...}
+    objects with a hand-written answer; text files hold one question per line.
+    Returns a list of (question, answer_or_None).
+    """
+    path = path or os.getenv("WARMUP_QUESTIONS_FILE")
+    if not path:
+        return [(q, None) for q in CURATED_QUESTIONS]
+
+    text = Path(path).read_text(encoding="utf-8")
+
+    if path.endswith(".json"):
+        items = []
+        for entry in json.loads(text):
+            if isinstance(entry, dict):
+                items.append((entry["question"], entry.get("answer")))
+            else:
+                items.append((str(entry), None))
+        return items
+
+    return [(line.strip(), None) for line in text.splitlines() if line.strip()]
+
+
+def llm_signature(llm):
+    """"<llm type>/<model>" recorded with generated answers, e.g. "groq-chat/llama-3.3-70b-versatile"."""
+    model = getattr(llm, "model_name", None) or getattr(llm, "model", None)
+    return f"{llm._llm_type}/{model}" if model else llm._llm_type
+
+
+def is_servable(entry):
+    """
+    Whether an entry's answer may be shown to students: vetted answers always;
+    unvetted ones only when allowed and produced by a real LLM backend
+    (entries without a recorded generator are treated as unverified).
+    """
+    if not entry or not entry.get("answer"):
+        return False
+    if entry.get("vetted"):
+        return True
+    if REQUIRE_VETTED:
+        return False
+    generated_by = entry.get("generated_by")
+    return bool(generated_by) and generated_by.split("/")[0] not in UNSERVABLE_LLM_TYPES
+
+
+def _doc_to_dict(doc):
+    return {"page_content": doc.page_content, "metadata": doc.metadata}
+
+
+def _dict_to_doc(data):
+    from langchain_core.documents import Document
+    return Document(page_content=data["page_content"], metadata=data["metadata"])
+
+
+class AnswerCache:
+    """
+    JSON file of precomputed entries for one vector store version:
+    normalized question -> question, embedding, context docs, answer, vetted,
+    generated_by (LLM signature, or "hand-written").
+    """
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, index_version, cache_dir=None):
+        self.index_version = index_version
+        self.cache_dir = Path(cache_dir or ANSWER_CACHE_DIR)
+        self.path = self.cache_dir / f"answers_{index_version}.json"
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.hits = 0
+
+        if self.path.exists():
+            with open(self.path, encoding="utf-8") as f:
+                self.entries = json.load(f).get("entries", {})
+            print(f"Loaded {len(self.entries)} precomputed answers from {self.path}")
+
+    @classmethod
+    def for_version(cls, index_version, cache_dir=None):
+        """Shared cache instance per vector store version (one per process)."""
+        key = (index_version, str(cache_dir or ANSWER_CACHE_DIR))
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(index_version, cache_dir)
+            return cls._instances[key]
+
+    def get(self, question):
+        """Cached entry for a question, or None."""
+        return self.entries.get(normalize_question(question))
+
+    def get_answer(self, question):
+        """Servable answer for a question, or None."""
+        entry = self.get(question)
+        if not is_servable(entry):
+            return None
+
+        with self.lock:
+            self.hits += 1
+        return entry["answer"]
+
+    def get_documents(self, question):
+        """Precomputed retrieval context for a question, or None."""
+        entry = self.get(question)
+        if not entry or not entry.get("context"):
+            return None
+        return [_dict_to_doc(d) for d in entry["context"]]
+
+    def put(self, question, embedding, docs, answer, vetted=False, generated_by=None):
+        with self.lock:
+            self.entries[normalize_question(question)] = {
+                "question": question,
+                "embedding": [float(x) for x in embedding],
+                "context": [_doc_to_dict(d) for d in docs],
+                "answer": answer,
+                "vetted": vetted,
+                "generated_by": generated_by,
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            }
+
+    def save(self):
+        """Write the cache atomically."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+
+        with self.lock:
+            data = {"index_version": self.index_version, "entries": self.entries}
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+def warm_up(tutor, items=None, regenerate=False, max_concurrency=None, requests_per_minute=None):
+    """
+    Precompute entries for curated questions that have no servable answer yet.
+    items: list of (question, answer_or_None); hand-written answers are stored as vetted.
+    Returns the number of entries written.
+    """
+    cache = tutor.answer_cache
+    items = items if items is not None else load_curated_questions()
+
+    pending = [
+        (question, answer) for question, answer in items
+        if regenerate or not is_servable(cache.get(question))
+    ]
+    if not pending:
+        print("Answer cache is warm, nothing to precompute.")
+        return 0
+
+    print(f"Warming answer cache for {len(pending)} questions...")
+    start = time.perf_counter()
+
+    questions = [question for question, _ in pending]
+    embeddings = tutor.retriever.embeddings.embed_documents(questions)
+    docs_per_question = tutor.retriever.search_by_vectors(embeddings, k=tutor.k)
+
+    # Only generate answers that were not supplied by hand
+    to_generate = [i for i, (_, answer) in enumerate(pending) if not answer]
+    signature = llm_signature(tutor.llm)
+    if to_generate and signature.split("/")[0] in UNSERVABLE_LLM_TYPES:
+        print(f"Answers from {signature} are stored for their context only and never served.")
+    generated = tutor._generate_batch(
+        [questions[i] for i in to_generate],
+        [docs_per_question[i] for i in to_generate],
+        max_concurrency or 4,
+        requests_per_minute or 0,
+    )
+    generated = dict(zip(to_generate, generated))
+
+    written = 0
+    for i, (question, answer) in enumerate(pending):
+        vetted = bool(answer)
+        generated_by = "hand-written"
+        if not answer:
+            answer, error = generated[i]
+            generated_by = signature
+            if error:
+                print(f"Skipping answer for '{question}': {error}")
+
+        cache.put(question, embeddings[i], docs_per_question[i], answer,
+                  vetted=vetted, generated_by=generated_by)
+        written += 1
+
+    cache.save()
+    print(f"Answer cache warmed: {written} entries in {time.perf_counter() - start:.1f}s -> {cache.path}")
+    return written
+
+
+_background_started = set()
+_background_lock = threading.Lock()
+
+
+def start_background_warm_up(tutor):
+    """Warm the cache in a daemon thread, once per process and index version."""
+    with _background_lock:
+        if tutor.answer_cache.index_version in _background_started:
+            return None
+        _background_started.add(tutor.answer_cache.index_version)
+
+    thread = threading.Thread(target=warm_up, args=(tutor,), name="answer-cache-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute answers for curated questions")
+    parser.add_argument("--questions", help="Curated questions (.json or text file)")
+    parser.add_argument("--regenerate", action="store_true", help="Recompute existing entries")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent LLM calls")
+    parser.add_argument("--rpm", type=float, default=0, help="LLM requests per minute (0 = unlimited)")
+    args = parser.parse_args()
+
+    sys.path.append(str(Path(__file__).parent.parent))
+    from chains.tutor_chain import AITutor
+
+    tutor = AITutor()
+    warm_up(
+        tutor,
+        load_curated_questions(args.questions),
+        regenerate=args.regenerate,
+        max_concurrency=args.concurrency,
+        requests_per_minute=args.rpm,
+    )
+
+
+if __name__ == "__main__":
+    main()
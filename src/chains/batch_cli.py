@@ -0,0 +1,120 @@
+"""
+AI Tutor - Worksheet Batch Answering
+Answer a whole exercise set in one run.
+
+Usage:
+    python src/chains/batch_cli.py worksheet.txt --output answers.json
+Input: one question per line (numbering like "1." or "Q2)" is stripped),
+or a .json list of questions.
+"""
+
+import re
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from chains.tutor_chain import AITutor
+from safety.content_filter import ContentFilter
+
+_NUMBERING_PATTERN = re.compile(r"^\s*(?:Q\.?\s*)?\d+\s*[\.\):]\s*", re.IGNORECASE)
+
+
+def load_questions(path):
+    """Read questions from a text or JSON file."""
+    text = Path(path).read_text(encoding="utf-8")
+
+    if path.endswith(".json"):
+        return [str(q).strip() for q in json.loads(text) if str(q).strip()]
+
+    questions = []
+    for line in text.splitlines():
+        question = _NUMBERING_PATTERN.sub("", line).strip()
+        if question:
+            questions.append(question)
+    return questions
+
+
+def answer_worksheet(tutor, questions, max_concurrency=None, requests_per_minute=None):
+    """
+    Filter questions for safety, then answer the safe ones in one batch.
+    Returns results in the original order; blocked questions carry an error.
+    """
+    results = [None] * len(questions)
+    safe_indices = []
+
+    for i, question in enumerate(questions):
+        is_safe, safety_msg = ContentFilter.is_safe(question)
+        if is_safe:
+            safe_indices.append(i)
+        else:
+            results[i] = {"question": question, "answer": None, "sources": [], "error": safety_msg}
+
+    batch = tutor.ask_batch(
+        [questions[i] for i in safe_indices],
+        max_concurrency=max_concurrency,
+        requests_per_minute=requests_per_minute,
+    )
+    for i, result in zip(safe_indices, batch):
+        if result["answer"]:
+            result["answer"] = ContentFilter.add_safety_context(result["answer"])
+        results[i] = result
+
+    return results
+
+
+def format_text(results):
+    output = "AI TUTOR - WORKSHEET ANSWERS\n"
+    output += "=" * 60 + "\n\n"
+
+    for i, result in enumerate(results, 1):
+        output += f"Q{i}. {result['question']}\n\n"
+        if result["error"]:
+            output += f"[Not answered: {result['error']}]\n"
+        else:
+            output += f"{result['answer']}\n"
+            if result["sources"]:
+                output += f"\nSources: {'; '.join(result['sources'])}\n"
+        output += "\n" + "-" * 60 + "\n\n"
+
+    return output
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a worksheet of questions in one batch")
+    parser.add_argument("questions", help="Text file (one question per line) or JSON list")
+    parser.add_argument("--output", help="Write results here (.json or .txt); prints if omitted")
+    parser.add_argument("--concurrency", type=int, help="Concurrent LLM calls")
+    parser.add_argument("--rpm", type=float, help="LLM requests per minute (0 = unlimited)")
+    parser.add_argument("--llm-backend", help="LLM backend (defaults to LLM_BACKEND)")
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)
+    print(f"Loaded {len(questions)} questions from {args.questions}")
+
+    tutor = AITutor(llm_backend=args.llm_backend)
+
+    start = time.perf_counter()
+    results = answer_worksheet(tutor, questions, args.concurrency, args.rpm)
+    elapsed = time.perf_counter() - start
+
+    answered = sum(1 for r in results if r["answer"])
+    rate = len(questions) / elapsed if elapsed else 0.0
+    print(f"Answered {answered}/{len(questions)} questions in {elapsed:.1f}s ({rate:.2f} questions/s)")
+
+    if args.output and args.output.endswith(".json"):
+        output = json.dumps(results, indent=4, ensure_ascii=False)
+    else:
+        output = format_text(results)
+
+    if args.output:
+        Path(args.output).write_text(output, encoding="utf-8")
+        print(f"Results written to {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""
+AI Tutor - LLM Backends
+Selects the chat model used by the tutor chain from configuration.
+
+Backends (set LLM_BACKEND):
+- groq   : Groq hosted Llama (default)
+- openai : any OpenAI-compatible server (vLLM, llama.cpp, Ollama, LM Studio...)
+- fake   : built-in deterministic stand-in for offline runs and load testing
+"""
+
+import os
+import re
+import json
+import time
+import random
+import itertools
+import threading
+from pathlib import Path
+from typing import Any, Iterator, List, Optional
+
+from dotenv import load_dotenv
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+# Load environment variables
+load_dotenv()
+
+DEFAULT_GROQ_MODEL = "llama-3.3-70b-versatile"
+DEFAULT_TEMPERATURE = 0.7
+
+# Patterns used by the fake backend to find the student's question in a prompt
+_FOLLOW_UP_PATTERN = re.compile(r"Follow Up Input:\s*(.+)")
+_QUESTION_PATTERN = re.compile(r"Student's question:\s*(.+)")
+_TOKEN_PATTERN = re.compile(r"\S+\s*")
+
+
+class FakeLLMError(RuntimeError):
+    """Failure injected by FakeChatModel (stands in for provider errors)."""
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic chat model that never touches the network.
+
+    Replies with the configured canned responses (round-robin) or, when none
+    are given, echoes the student's question. Follow-up condensing prompts
+    always get the follow-up back and do not use up a canned response.
+    `latency` is the delay before the first token and `tokens_per_sec`
+    throttles the rest (0 = unthrottled).
+
+    Fault injection for resilience testing: `failure_rate` of calls raise
+    FakeLLMError and `hang_rate` of calls stall for `hang_seconds` first.
+    """
+
+    responses: List[str] = []
+    latency: float = 0.0
+    tokens_per_sec: float = 0.0
+    failure_rate: float = 0.0
+    hang_rate: float = 0.0
+    hang_seconds: float = 60.0
+
+    _counter: Any = PrivateAttr(default_factory=itertools.count)
+
+    @property
+    def _llm_type(self):
+        return "fake-tutor"
+
+    def _reply_for(self, messages):
+        """Pick the reply text for a prompt."""
+        prompt = messages[-1].content if messages else ""
+
+        # Question condensing step: hand the follow-up back unchanged
+        # (never consumes a canned reply, so answers stay in order across follow-ups)
+        follow_ups = _FOLLOW_UP_PATTERN.findall(prompt)
+        if follow_ups:
+            return follow_ups[-1].strip()
+
+        if self.responses:
+            return self.responses[next(self._counter) % len(self.responses)]
+
+        questions = _QUESTION_PATTERN.findall(prompt)
+        question = questions[-1].strip() if questions else prompt.strip()
+        return f"Echo: {question}"
+
+    def _tokens(self, text):
+        return _TOKEN_PATTERN.findall(text) or [text]
+
+    def _inject_faults(self):
+        """Hang and/or fail this call according to the configured rates."""
+        if self.hang_rate and random.random() < self.hang_rate:
+            time.sleep(self.hang_seconds)
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise FakeLLMError("Injected LLM failure")
+
+    def _token_delay(self):
+        return 1.0 / self.tokens_per_sec if self.tokens_per_sec > 0 else 0.0
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        self._inject_faults()
+        text = self._reply_for(messages)
+
+        delay = self.latency + self._token_delay() * len(self._tokens(text))
+        if delay > 0:
+            time.sleep(delay)
+
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        self._inject_faults()
+        text = self._reply_for(messages)
+        token_delay = self._token_delay()
+
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+        for token in self._tokens(text):
+            if token_delay > 0:
+                time.sleep(token_delay)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+
+def _load_fake_responses(path):
+    """Load canned responses from a JSON list or a plain text file (one per line)."""
+    if not path:
+        return []
+
+    text = Path(path).read_text(encoding="utf-8")
+    if path.endswith(".json"):
+        return [str(r) for r in json.loads(text)]
+    return [line for line in text.splitlines() if line.strip()]
+
+
+def _create_groq(**overrides):
+    from langchain_groq import ChatGroq
+
+    params = {
+        "api_key": os.getenv("GROQ_API_KEY"),
+        "model": os.getenv("LLM_MODEL", DEFAULT_GROQ_MODEL),
+        "temperature": float(os.getenv("LLM_TEMPERATURE", DEFAULT_TEMPERATURE)),
+    }
+    params.update(overrides)
+    return ChatGroq(**params)
+
+
+def _create_openai_compatible(**overrides):
+    try:
+        from langchain_openai import ChatOpenAI
+    except ImportError as e:
+        raise ImportError(
+            "The 'openai' LLM backend needs langchain-openai: pip install langchain-openai"
+        ) from e
+
+    params = {
+        "base_url": os.getenv("LLM_BASE_URL", "http://localhost:8000/v1"),
+        "api_key": os.getenv("LLM_API_KEY", "not-needed"),
+        "model": os.getenv("LLM_MODEL", DEFAULT_GROQ_MODEL),
+        "temperature": float(os.getenv("LLM_TEMPERATURE", DEFAULT_TEMPERATURE)),
+    }
+    params.update(overrides)
+    return ChatOpenAI(**params)
+
+
+def _create_fake(**overrides):
+    params = {
+        "responses": _load_fake_responses(os.getenv("FAKE_LLM_RESPONSES")),
+        "latency": float(os.getenv("FAKE_LLM_LATENCY", 0.0)),
+        "tokens_per_sec": float(os.getenv("FAKE_LLM_TOKENS_PER_SEC", 0.0)),
+        "failure_rate": float(os.getenv("FAKE_LLM_FAILURE_RATE", 0.0)),
+        "hang_rate": float(os.getenv("FAKE_LLM_HANG_RATE", 0.0)),
+        "hang_seconds": float(os.getenv("FAKE_LLM_HANG_SECONDS", 60.0)),
+    }
+    params.update(overrides)
+    return FakeChatModel(**params)
+
+
+LLM_BACKENDS = {
+    "groq": _create_groq,
+    "openai": _create_openai_compatible,
+    "fake": _create_fake,
+}
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket for outgoing LLM calls.
+    `requests_per_minute` sets the sustained rate, `burst` how many may start at once.
+    """
+
+    def __init__(self, requests_per_minute, burst=1):
+        self.interval = 60.0 / requests_per_minute
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a call may be made."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) / self.interval)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) * self.interval
+            time.sleep(wait)
+
+
+def create_llm(backend=None, **overrides):
+    """
+    Create the chat model for the configured backend.
+    Keyword overrides are passed to the backend's constructor.
+    """
+    backend = (backend or os.getenv("LLM_BACKEND", "groq")).lower()
+
+    if backend not in LLM_BACKENDS:
+        raise ValueError(
+            f"Unknown LLM backend '{backend}'. Choose one of: {', '.join(LLM_BACKENDS)}"
+        )
+
+    return LLM_BACKENDS[backend](**overrides)
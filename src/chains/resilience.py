@@ -0,0 +1,269 @@
+"""
+AI Tutor - LLM Call Resilience
+Deadlines, bounded retries with jittered backoff and a circuit breaker around
+the LLM backend, so a slow or failing provider bounds how long a student waits
+instead of leaving the request hanging.
+
+Each attempt runs on a worker thread and is abandoned (not killed) when it
+exceeds its timeout; the breaker then stops new calls to a failing backend
+until it has had time to recover.
+"""
+
+import os
+import time
+import queue
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+# Whole ask() budget and per-attempt timeout (time to first token, then between tokens, when streaming)
+ASK_DEADLINE = float(os.getenv("ASK_DEADLINE", 45))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 20))
+
+# Retries after the first attempt, with full-jitter exponential backoff
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 2))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", 0.5))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", 4))
+
+# Consecutive failures that open the breaker, and how long it stays open
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", 5))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", 30))
+
+# Threads for LLM attempts; an abandoned (hung) attempt holds one until it returns
+LLM_CALL_THREADS = int(os.getenv("LLM_CALL_THREADS", 32))
+
+_executor = ThreadPoolExecutor(max_workers=LLM_CALL_THREADS, thread_name_prefix="llm-call")
+_STREAM_END = object()
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a request runs out of its time budget."""
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a backend the circuit breaker considers down."""
+
+
+class Deadline:
+    """Absolute time budget for one request."""
+
+    def __init__(self, seconds=None):
+        self.seconds = ASK_DEADLINE if seconds is None else seconds
+        self.expires_at = time.monotonic() + self.seconds
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def timeout(self, limit=None):
+        """Time allowed for the next step: the remaining budget, capped at limit."""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded(f"Request deadline of {self.seconds:.0f}s exceeded")
+        return remaining if limit is None else min(limit, remaining)
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after `failure_threshold` consecutive failures; open rejects
+    calls for `reset_timeout` seconds, then lets one trial call through
+    (half-open) whose outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold=None, reset_timeout=None):
+        self.failure_threshold = failure_threshold or CIRCUIT_FAILURE_THRESHOLD
+        self.reset_timeout = CIRCUIT_RESET_TIMEOUT if reset_timeout is None else reset_timeout
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.rejected = 0
+
+    @property
+    def state(self):
+        with self.lock:
+            return self._state()
+
+    def _state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        """Raise CircuitOpenError unless a call may be made now."""
+        with self.lock:
+            state = self._state()
+            if state == "closed":
+                return
+            if state == "half_open" and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return
+            self.rejected += 1
+        raise CircuitOpenError("The language model is temporarily unavailable")
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial_in_flight or self.failures >= self.failure_threshold:
+                if self.opened_at is None or self.trial_in_flight:
+                    print(f"Circuit breaker opened after {self.failures} consecutive LLM failures.")
+                self.opened_at = time.monotonic()
+            self.trial_in_flight = False
+
+    def release_trial(self):
+        """Give up a half-open trial without an outcome (its caller went away)."""
+        with self.lock:
+            self.trial_in_flight = False
+
+    def stats(self):
+        with self.lock:
+            return {"state": self._state(), "failures": self.failures, "rejected": self.rejected}
+
+
+def backoff_delay(attempt, base=None, cap=None):
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2**attempt)]."""
+    base = LLM_RETRY_BASE_DELAY if base is None else base
+    cap = LLM_RETRY_MAX_DELAY if cap is None else cap
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def _sleep_before_retry(attempt, deadline):
+    delay = backoff_delay(attempt)
+    if delay >= deadline.remaining():
+        return False
+    time.sleep(delay)
+    return True
+
+
+def call_with_resilience(fn, deadline, breaker, timeout=None, retries=None):
+    """
+    Call fn() under the breaker with a per-attempt timeout, retrying failures
+    with jittered backoff while the deadline allows. Raises the last error.
+    A timed-out attempt is not retried: it may still be running (and billed),
+    and a long answer would only time out again.
+    """
+    timeout = LLM_TIMEOUT if timeout is None else timeout
+    retries = LLM_MAX_RETRIES if retries is None else retries
+
+    for attempt in range(retries + 1):
+        attempt_timeout = deadline.timeout(timeout)
+        breaker.allow()
+        future = _executor.submit(fn)
+        try:
+            result = future.result(timeout=attempt_timeout)
+        except FutureTimeout:
+            # Don't let a queued attempt hit the failing backend later
+            future.cancel()
+            if attempt_timeout >= timeout:
+                breaker.record_failure()
+            # else the request ran out of budget before the backend's own timeout
+            raise DeadlineExceeded(f"LLM call timed out after {attempt_timeout:.1f}s (attempt {attempt + 1})")
+        except Exception as e:
+            breaker.record_failure()
+            error = e
+        else:
+            breaker.record_success()
+            return result
+
+        print(f"LLM call failed: {error}")
+        if attempt == retries or not _sleep_before_retry(attempt, deadline):
+            raise error
+
+
+def stream_with_resilience(make_stream, deadline, breaker, timeout=None, retries=None):
+    """
+    Yield tokens from make_stream() with the same protections as
+    call_with_resilience. The first token must arrive within the per-attempt
+    timeout and the deadline; after that the deadline no longer applies and
+    each token only has to follow the previous one within the timeout.
+    Attempts are only retried before the first token was yielded.
+    """
+    timeout = LLM_TIMEOUT if timeout is None else timeout
+    retries = LLM_MAX_RETRIES if retries is None else retries
+
+    for attempt in range(retries + 1):
+        breaker.allow()
+        tokens = queue.Queue()
+
+        def produce(tokens=tokens):  # Bound per attempt: an abandoned producer keeps its own queue
+            try:
+                for token in make_stream():
+                    tokens.put(token)
+            except Exception as e:
+                tokens.put(e)
+            finally:
+                tokens.put(_STREAM_END)
+
+        future = _executor.submit(produce)
+        started = False
+        recorded = False
+        try:
+            while True:
+                try:
+                    item = tokens.get(timeout=timeout if started else deadline.timeout(timeout))
+                except queue.Empty:
+                    if not started and deadline.expired():
+                        raise DeadlineExceeded("LLM stream did not start before the request deadline")
+                    raise DeadlineExceeded(f"LLM stream stalled (attempt {attempt + 1})")
+                if item is _STREAM_END:
+                    recorded = True
+                    breaker.record_success()
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                started = True
+                yield item
+        except GeneratorExit:
+            raise
+        except Exception as e:
+            future.cancel()
+            if not started and deadline.expired():
+                # The request ran out of budget, which says nothing about the backend
+                raise
+            recorded = True
+            breaker.record_failure()
+            print(f"LLM stream failed: {e}")
+            if started or attempt == retries or not _sleep_before_retry(attempt, deadline):
+                raise
+        finally:
+            if not recorded:
+                # The consumer closed the stream: tokens mean the backend answered,
+                # otherwise just free the half-open trial slot
+                if started:
+                    breaker.record_success()
+                else:
+                    breaker.release_trial()
+
+
+def test_half_open_stream_closed_by_consumer():
+    """A consumer that stops reading a half-open trial stream must not leave the breaker stuck."""
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.state == "half_open"
+
+    def generate():
+        yield from ["first ", "second ", "third "]
+
+    # Closed after the first token: the backend answered, so the circuit closes
+    tokens = stream_with_resilience(generate, Deadline(5), breaker)
+    assert next(tokens) == "first "
+    tokens.close()
+    assert breaker.stats() == {"state": "closed", "failures": 0, "rejected": 0}, breaker.stats()
+
+    # The next call goes through instead of waiting on a trial nobody finishes
+    breaker.allow()
+    print(f"Half-open stream closed by its consumer: breaker {breaker.stats()}")
+
+
+if __name__ == "__main__":
+    test_half_open_stream_closed_by_consumer()
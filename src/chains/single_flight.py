@@ -0,0 +1,197 @@
+"""
+AI Tutor - Single-Flight Request Coalescing
+When many students send the same history-free question at once (a sidebar
+sample at the start of class), only the first call does the retrieval and
+generation; concurrent identical calls wait for it and share the result or
+the token stream. Shared by every session through load_shared_resources.
+"""
+
+import threading
+
+
+class _Call:
+    """One in-flight execution and everything its waiters need."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _StreamCall:
+    """One in-flight stream; tokens are kept so late joiners replay from the start."""
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.tokens = []
+        self.finished = False
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one execution."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.streams = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key, fn, timeout=None):
+        """
+        Run fn() once for all concurrent callers with this key; all get its result or error.
+        Callers that join a call in flight wait at most `timeout` seconds, then raise TimeoutError.
+        """
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+                self.executed += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            if not call.done.wait(timeout):
+                raise TimeoutError(f"Gave up waiting for an identical request after {timeout:.1f}s")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+
+    def stream(self, key, fn):
+        """
+        Yield the tokens of fn() (an iterator) once for all concurrent callers with this key.
+        The first caller produces the stream; the others follow it token by token.
+        """
+        with self.lock:
+            call = self.streams.get(key)
+            leader = call is None
+            if leader:
+                call = self.streams[key] = _StreamCall()
+                self.executed += 1
+            else:
+                self.coalesced += 1
+                with call.cond:
+                    call.followers += 1
+
+        if leader:
+            yield from self._produce(key, call, fn)
+        else:
+            yield from self._follow(call)
+
+    def _produce(self, key, call, fn):
+        def publish(token):
+            with call.cond:
+                call.tokens.append(token)
+                call.cond.notify_all()
+
+        try:
+            iterator = iter(fn())
+            for token in iterator:
+                publish(token)
+                yield token
+        except GeneratorExit:
+            # The leader's consumer went away; finish the stream for anyone following it.
+            # Unregister first so nobody joins after the followers are counted.
+            self._unregister(key, call)
+            with call.cond:
+                followers = call.followers
+            if followers:
+                try:
+                    for token in iterator:
+                        publish(token)
+                except Exception as e:
+                    call.error = e
+            raise
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            self._unregister(key, call)
+            with call.cond:
+                call.finished = True
+                call.cond.notify_all()
+
+    def _unregister(self, key, call):
+        # Only remove this call: a new stream may already be registered under the key
+        with self.lock:
+            if self.streams.get(key) is call:
+                del self.streams[key]
+
+    def _follow(self, call):
+        position = 0
+        while True:
+            with call.cond:
+                while position >= len(call.tokens) and not call.finished:
+                    call.cond.wait()
+                tokens = call.tokens[position:]
+                finished = call.finished
+            position += len(tokens)
+            yield from tokens
+
+            if finished and position >= len(call.tokens):
+                if call.error is not None:
+                    raise call.error
+                return
+
+    def stats(self):
+        """Executions run and calls saved by joining one already in flight."""
+        with self.lock:
+            return {
+                "executed": self.executed,
+                "coalesced": self.coalesced,
+                "in_flight": len(self.calls) + len(self.streams),
+            }
+
+
+def test_leader_closes_while_follower_joins(rounds=50):
+    """A follower joining around the moment the leader's consumer goes away still gets the whole answer."""
+    import time
+
+    answer = [f"token{i} " for i in range(5)]
+
+    def generate():
+        for token in answer:
+            time.sleep(0.002)
+            yield token
+
+    flight = SingleFlight()
+    for round_number in range(rounds):
+        leader = flight.stream("question", generate)
+        assert next(leader) == answer[0]
+
+        results = []
+
+        def follow(delay=0.0003 * (round_number % 10)):  # Join before, during or after the close
+            time.sleep(delay)
+            results.append(list(flight.stream("question", generate)))
+
+        follower = threading.Thread(target=follow)
+        follower.start()
+        time.sleep(0.0015)
+        leader.close()
+        follower.join(timeout=5)
+
+        assert not follower.is_alive(), "follower hung"
+        assert results == [answer], results
+
+    stats = flight.stats()
+    assert stats["in_flight"] == 0, stats
+    print(f"Leader closed early {rounds} times: every follower got the full answer {stats}")
+
+
+if __name__ == "__main__":
+    test_leader_closes_while_follower_joins()
@@ -5,10 +5,10 @@ Combines retrieval + Groq LLM + memory
 
 import os
 from pathlib import Path
-from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 
 # Langchain imports
-from langchain_groq import ChatGroq
 from langchain.chains import ConversationalRetrievalChain
 from langchain.memory import ConversationBufferMemory
 from langchain.prompts import PromptTemplate
@@ -16,16 +16,73 @@ from langchain.prompts import PromptTemplate
 import sys
 sys.path.append(str(Path(__file__).parent.parent))
 from retrieval.query_vectorstore import VectorStoreRetriever
+from chains.llm_backends import create_llm, RateLimiter
+from chains.answer_cache import AnswerCache, normalize_question, start_background_warm_up
+from chains.single_flight import SingleFlight
+from chains.resilience import Deadline, CircuitBreaker, call_with_resilience, stream_with_resilience
 
-# Load environment variables
-load_dotenv()
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+# Worksheet batching defaults (0 requests/minute = no rate limit)
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", 4))
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", 0))
+
+# Precompute curated answers in the background when a tutor starts
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "0") == "1"
+
+# Follow-up turns whose question embedding is close to the previous turn's
+# reuse its documents (>= REUSE) or extend them with a few new hits (>= EXTEND)
+RETRIEVAL_REUSE_THRESHOLD = float(os.getenv("RETRIEVAL_REUSE_THRESHOLD", 0.75))
+RETRIEVAL_EXTEND_THRESHOLD = float(os.getenv("RETRIEVAL_EXTEND_THRESHOLD", 0.55))
+RETRIEVAL_EXTEND_DOCS = int(os.getenv("RETRIEVAL_EXTEND_DOCS", 1))
+
+# Reply used when the LLM is unavailable: retrieved passages with citations
+DEGRADED_PASSAGE_CHARS = int(os.getenv("DEGRADED_PASSAGE_CHARS", 600))
+DEGRADED_NOTICE = (
+    "⚠️ I can't reach my language model right now, so here are the most relevant "
+    "passages from your textbooks. Please ask again in a moment for a full explanation."
+)
+
+
+def format_sources(docs):
+    """Short citations ("Physics.pdf, Page 5, Light") for retrieved documents."""
+    sources = []
+    for doc in docs:
+        source = doc.metadata.get('source', 'Unknown').replace('\\', '/').split('/')[-1]
+        page = doc.metadata.get('page', 'Unknown')
+        chapter = doc.metadata.get('chapter')
+        sources.append(f"{source}, Page {page}, {chapter}" if chapter else f"{source}, Page {page}")
+    return sources
+
+
+def _format_chat_history(messages):
+    """Render memory messages the way ConversationalRetrievalChain does."""
+    roles = {"human": "Human: ", "ai": "Assistant: "}
+    buffer = ""
+    for message in messages:
+        buffer += f"\n{roles.get(message.type, message.type + ': ')}{message.content}"
+    return buffer
+
+
+def _doc_key(doc):
+    return (doc.metadata.get('source'), doc.metadata.get('page'), doc.page_content)
+
+
+def _cosine(a, b):
+    a = np.asarray(a, dtype=np.float32)
+    b = np.asarray(b, dtype=np.float32)
+    return float(a @ b / max(np.linalg.norm(a) * np.linalg.norm(b), 1e-12))
 
 class AITutor:
 
-    def __init__(self):
+    def __init__(self, llm=None, retriever=None, llm_backend=None, answer_cache=None,
+                 single_flight=None, circuit_breaker=None):
         """
         Main AI Tutor class that orchestrates retrieval + LLM + memory
+
+        llm / retriever / answer_cache: pre-built instances to share between tutors
+        llm_backend: backend name for create_llm (defaults to LLM_BACKEND)
+        single_flight: SingleFlight shared between tutors, so identical
+            history-free questions asked at the same time run only once
+        circuit_breaker: CircuitBreaker shared between tutors using the same LLM
         """
 
         print("="*80)
@@ -33,14 +90,25 @@ class AITutor:
         print("="*80)
 
         # Initialize LLM
-        llm = ChatGroq(
-            api_key=GROQ_API_KEY, 
-            model="llama-3.3-70b-versatile", 
-            temperature=0.7
-        )
+        self.llm = llm or create_llm(llm_backend)
         
         # Initialize retriever
-        retriever = VectorStoreRetriever()
+        self.retriever = retriever or VectorStoreRetriever()
+        self.k = 3
+
+        # Precomputed answers for curated questions, tied to this index build
+        self.answer_cache = answer_cache or AnswerCache.for_version(self.retriever.index_version)
+
+        # Last turn's query embedding and documents, for follow-up reuse
+        self.last_turn = None
+        self.reuse_stats = {"follow_ups": 0, "reused": 0, "extended": 0}
+
+        # Coalesces identical first-turn questions across sessions
+        self.single_flight = single_flight or SingleFlight()
+
+        # LLM calls get deadlines, retries and a breaker; failures fall back to passages
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.last_response_degraded = False
         
         # Initialize memory
         self.memory = ConversationBufferMemory(
@@ -70,34 +138,309 @@ Student's question: {question}
 
 Your response (be encouraging and clear):"""
 
-        qa_prompt = PromptTemplate(
+        self.qa_prompt = qa_prompt = PromptTemplate(
             template=prompt_template,
             input_variables=["context", "chat_history", "question"]
         )
         
         # Build the chain with custom prompt
         self.chain = ConversationalRetrievalChain.from_llm(
-            llm=llm,
-            retriever=retriever.vectorstore.as_retriever(search_kwargs={"k": 3}),
+            llm=self.llm,
+            retriever=self.retriever.vectorstore.as_retriever(search_kwargs={"k": self.k}),
             memory=self.memory,
             return_source_documents=True,
             combine_docs_chain_kwargs={"prompt": qa_prompt}  
         )
         
+        if WARMUP_ON_STARTUP:
+            start_background_warm_up(self)
+
         print("AI TUTOR CHAIN READY.")
         print("="*80)
 
     def ask(self, question):
         """
         Ask a question to the AI Tutor chain
+        LLM steps share one deadline (ASK_DEADLINE); if the LLM stays unavailable
+        the reply is the retrieved textbook passages with citations.
         """
+        deadline = Deadline()
+        self.last_response_degraded = False
         try:
-            response = self.chain.invoke({"question": question})
-            return response["answer"]
+            chat_history = _format_chat_history(self.memory.chat_memory.messages)
+
+            # Curated questions asked without prior context are served precomputed
+            answer = self._cached_answer(question, chat_history)
+            if answer:
+                self.memory.save_context({"question": question}, {"answer": answer})
+                return answer
+
+            docs = None
+            try:
+                if chat_history:
+                    # Same steps as ConversationalRetrievalChain: condense -> retrieve -> answer
+                    query = self._condense_question(question, chat_history, deadline)
+                    docs = self._retrieve(query, follow_up=True)
+                    answer = self._generate(query, docs, chat_history, deadline)
+                else:
+                    # History-free: share the work with identical questions in flight
+                    docs = self._retrieve_shared(question)
+                    answer = self.single_flight.do(
+                        ("answer", normalize_question(question)),
+                        lambda: self._generate(question, docs, chat_history, deadline),
+                        timeout=deadline.remaining(),
+                    )
+            except Exception as e:
+                if docs is None:  # Retrieval itself failed
+                    raise
+                print(f"LLM unavailable, answering from the textbook: {e}")
+                return self._degraded_answer(docs)
+
+            self.memory.save_context({"question": question}, {"answer": answer})
+            return answer
         except Exception as e:
             print(f"Error during chain execution: {e}")
             return None
 
+    def stream(self, question):
+        """
+        Ask a question and yield the answer text as it is generated.
+        The full answer is saved to memory once the stream completes.
+        If the LLM fails before the first token, the degraded reply is yielded instead.
+        """
+        deadline = Deadline()
+        self.last_response_degraded = False
+        chat_history = _format_chat_history(self.memory.chat_memory.messages)
+
+        answer = self._cached_answer(question, chat_history)
+        if answer:
+            self.memory.save_context({"question": question}, {"answer": answer})
+            yield answer
+            return
+
+        if chat_history:
+            query = self._condense_question(question, chat_history, deadline)
+            docs = self._retrieve(query, follow_up=True)
+            tokens = self._generate_stream(query, docs, chat_history, deadline)
+        else:
+            docs = self._retrieve_shared(question)
+            tokens = self.single_flight.stream(
+                ("stream", normalize_question(question)),
+                lambda: self._generate_stream(question, docs, chat_history, deadline),
+            )
+
+        parts = []
+        try:
+            for token in tokens:
+                parts.append(token)
+                yield token
+        except Exception as e:
+            if parts:
+                raise
+            print(f"LLM unavailable, answering from the textbook: {e}")
+            yield self._degraded_answer(docs)
+            return
+
+        self.memory.save_context({"question": question}, {"answer": "".join(parts)})
+
+    def ask_batch(self, questions, max_concurrency=None, requests_per_minute=None):
+        """
+        Answer a worksheet of independent questions.
+        Questions are embedded and searched in one batch, LLM calls run
+        concurrently under the rate limit. Conversation memory is not used.
+        Returns one dict per question, in order: question, answer, sources, error.
+        """
+        max_concurrency = max_concurrency or BATCH_MAX_CONCURRENCY
+        if requests_per_minute is None:
+            requests_per_minute = LLM_REQUESTS_PER_MINUTE
+
+        results = [
+            {"question": q, "answer": None, "sources": [], "error": None}
+            for q in questions
+        ]
+        if not questions:
+            return results
+
+        try:
+            docs_per_question = self.retriever.retrieve_batch(questions, k=self.k)
+        except Exception as e:
+            print(f"Error during batch retrieval: {e}")
+            for result in results:
+                result["error"] = f"Retrieval failed: {e}"
+            return results
+
+        answers = self._generate_batch(questions, docs_per_question, max_concurrency, requests_per_minute)
+
+        for result, docs, (answer, error) in zip(results, docs_per_question, answers):
+            result["sources"] = format_sources(docs)
+            result["answer"] = answer
+            result["error"] = error
+
+        return results
+
+    def _generate_batch(self, questions, docs_per_question, max_concurrency, requests_per_minute):
+        """
+        Run history-free generations concurrently under a rate limit.
+        Returns (answer, error) pairs in input order.
+        """
+        limiter = RateLimiter(requests_per_minute, burst=max_concurrency) if requests_per_minute else None
+
+        def answer_one(question, docs):
+            if limiter:
+                limiter.acquire()
+            return self._generate(question, docs, chat_history="")
+
+        answers = []
+        with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+            futures = [
+                pool.submit(answer_one, q, docs)
+                for q, docs in zip(questions, docs_per_question)
+            ]
+            for question, future in zip(questions, futures):
+                try:
+                    answers.append((future.result(), None))
+                except Exception as e:
+                    print(f"Error answering '{question}': {e}")
+                    answers.append((None, str(e)))
+
+        return answers
+
+    def _cached_answer(self, question, chat_history):
+        """Precomputed answer for a history-free curated question, or None."""
+        if chat_history:
+            return None
+        answer = self.answer_cache.get_answer(question)
+        if answer:
+            entry = self.answer_cache.get(question)
+            self._remember_turn(entry.get("embedding"), self.answer_cache.get_documents(question) or [])
+        return answer
+
+    def _condense_question(self, question, chat_history, deadline=None):
+        """
+        Rewrite a follow-up into a standalone question (first turns pass through).
+        If the LLM is unavailable the follow-up is used as-is for retrieval.
+        """
+        if not chat_history:
+            return question
+        try:
+            response = self._call_llm(
+                lambda: self.chain.question_generator.invoke(
+                    {"question": question, "chat_history": chat_history}
+                ),
+                deadline,
+            )
+        except Exception as e:
+            print(f"Could not condense the follow-up, retrieving with it as-is: {e}")
+            return question
+        return response["text"]
+
+    def _retrieve(self, query, follow_up=False):
+        """
+        Retrieve textbook chunks for a standalone question.
+        Follow-ups that continue the previous turn reuse (or extend) its documents.
+        """
+        docs = self.answer_cache.get_documents(query)
+        if docs:
+            self._remember_turn(self.answer_cache.get(query).get("embedding"), docs)
+            return docs
+
+        vector = self.retriever.embeddings.embed_query(query)
+        docs = self._reuse_context(vector) if follow_up else None
+        if docs is None:
+            docs = self.retriever.search_by_vectors([vector], k=self.k)[0]
+
+        self._remember_turn(vector, docs)
+        return docs
+
+    def _retrieve_shared(self, question):
+        """History-free retrieval, run once for identical questions in flight."""
+        def retrieve():
+            self._retrieve(question)
+            return self.last_turn
+
+        self.last_turn = self.single_flight.do(("retrieve", normalize_question(question)), retrieve)
+        return self.last_turn["docs"]
+
+    def _reuse_context(self, vector):
+        """Documents for a follow-up judged a continuation of the last turn, or None."""
+        self.reuse_stats["follow_ups"] += 1
+        last = self.last_turn
+        if not last or last["vector"] is None or not last["docs"]:
+            return None
+
+        similarity = _cosine(vector, last["vector"])
+        if similarity >= RETRIEVAL_REUSE_THRESHOLD:
+            self.reuse_stats["reused"] += 1
+            docs = last["docs"]
+            action = "reused"
+        elif similarity >= RETRIEVAL_EXTEND_THRESHOLD:
+            # New hits go first, then the earlier context, capped so chained extensions stay bounded
+            seen = {_doc_key(doc) for doc in last["docs"]}
+            hits = self.retriever.search_by_vectors([vector], k=self.k)[0]
+            extra = [doc for doc in hits if _doc_key(doc) not in seen][:RETRIEVAL_EXTEND_DOCS]
+            self.reuse_stats["extended"] += 1
+            docs = (extra + last["docs"])[:self.k + RETRIEVAL_EXTEND_DOCS]
+            action = f"extended by {len(extra)}"
+        else:
+            docs = None
+            action = "new search"
+
+        print(f"Follow-up retrieval: {action} (similarity {similarity:.2f}, "
+              f"reuse rate {self.reuse_rate():.0%} of {self.reuse_stats['follow_ups']} follow-ups)")
+        return docs
+
+    def _remember_turn(self, vector, docs):
+        self.last_turn = {"vector": vector, "docs": list(docs)}
+
+    def reuse_rate(self):
+        """Share of follow-up turns that reused the previous turn's documents (as-is or extended)."""
+        stats = self.reuse_stats
+        if not stats["follow_ups"]:
+            return 0.0
+        return (stats["reused"] + stats["extended"]) / stats["follow_ups"]
+
+    def _call_llm(self, fn, deadline=None):
+        """Run an LLM call with per-attempt timeouts, jittered retries and the circuit breaker."""
+        return call_with_resilience(fn, deadline or Deadline(), self.circuit_breaker)
+
+    def _generate(self, question, docs, chat_history, deadline=None):
+        """Answer a question from the retrieved documents with the tutor prompt."""
+        response = self._call_llm(
+            lambda: self.chain.combine_docs_chain.invoke(
+                {"input_documents": docs, "question": question, "chat_history": chat_history}
+            ),
+            deadline,
+        )
+        return response["output_text"]
+
+    def _generate_stream(self, question, docs, chat_history, deadline=None):
+        """Stream the answer for the same prompt _generate uses (stuffed documents)."""
+        prompt = self.qa_prompt.format(
+            context="\n\n".join(doc.page_content for doc in docs),
+            chat_history=chat_history,
+            question=question,
+        )
+        return stream_with_resilience(
+            lambda: (chunk.content for chunk in self.llm.stream(prompt)),
+            deadline or Deadline(),
+            self.circuit_breaker,
+        )
+
+    def _degraded_answer(self, docs):
+        """Retrieval-only reply: the top textbook passages with their citations."""
+        self.last_response_degraded = True
+
+        passages = []
+        for citation, doc in zip(format_sources(docs), docs):
+            text = " ".join(doc.page_content.split())
+            if len(text) > DEGRADED_PASSAGE_CHARS:
+                text = text[:DEGRADED_PASSAGE_CHARS].rsplit(" ", 1)[0] + " …"
+            passages.append(f"**{citation}**\n\n> {text}")
+
+        if not passages:
+            return DEGRADED_NOTICE
+        return DEGRADED_NOTICE + "\n\n" + "\n\n".join(passages)
+
     def get_conversation_history(self):
         """
         Get the current conversation history from memory
@@ -109,6 +452,7 @@ Your response (be encouraging and clear):"""
         Clear the conversation history
         """
         self.memory.clear()
+        self.last_turn = None
         print("Conversation history cleared.")
 
 
@@ -0,0 +1,90 @@
+"""
+AI Tutor - Background Model Loading
+Keeps the heavy stack (LangChain, sentence-transformers/torch, FAISS, LLM client)
+out of the import path of app.py and loads it in a background thread,
+so the login screen renders before any model is touched.
+"""
+
+import sys
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(str(Path(__file__).parent.parent))
+from profiling.startup_profiler import profiler
+
+
+def load_shared_resources(llm_backend=None, mmap=None):
+    """
+    Import the model stack and build the resources every session shares:
+    the LLM client, the retriever (embeddings + FAISS index), the answer cache
+    the single-flight coalescer for identical questions and the LLM circuit breaker.
+    mmap=True opens the index read-only through mmap (defaults to VECTOR_STORE_MMAP).
+    """
+    with profiler.track("import chains.tutor_chain"):
+        from chains.llm_backends import create_llm
+        from chains.answer_cache import AnswerCache
+        from chains.single_flight import SingleFlight
+        from chains.resilience import CircuitBreaker
+        from retrieval.query_vectorstore import VectorStoreRetriever
+        import chains.tutor_chain  # noqa: F401  (LangChain chains and prompts)
+
+    retriever = VectorStoreRetriever(mmap=mmap)
+
+    with profiler.track("init LLM client"):
+        llm = create_llm(llm_backend)
+
+    with profiler.track("load answer cache"):
+        answer_cache = AnswerCache.for_version(retriever.index_version)
+
+    return {
+        "llm": llm,
+        "retriever": retriever,
+        "answer_cache": answer_cache,
+        "single_flight": SingleFlight(),
+        "circuit_breaker": CircuitBreaker(),
+    }
+
+
+class TutorPreloader:
+    """Loads shared resources once in a background thread and builds per-session tutors."""
+
+    def __init__(self, llm_backend=None):
+        self.llm_backend = llm_backend
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tutor-preload")
+        self._future = None
+        self._lock = threading.Lock()
+        self._reported = False
+
+    def start(self):
+        """Begin loading (no-op if already started). Returns the future."""
+        with self._lock:
+            if self._future is None:
+                self._future = self._executor.submit(load_shared_resources, self.llm_backend)
+            return self._future
+
+    def ready(self):
+        return self._future is not None and self._future.done()
+
+    def failed(self):
+        """True once loading has finished with an error (the preloader can't recover)."""
+        return self.ready() and self._future.exception() is not None
+
+    def resources(self, timeout=None):
+        """Wait for and return the shared resources (re-raises load errors)."""
+        return self.start().result(timeout=timeout)
+
+    def create_tutor(self, timeout=None):
+        """Build a tutor with its own conversation memory on the shared resources."""
+        resources = self.resources(timeout)
+
+        from chains.tutor_chain import AITutor
+        with profiler.track("create session tutor"):
+            tutor = AITutor(**resources)
+
+        profiler.mark("first tutor ready")
+        with self._lock:
+            if not self._reported:
+                self._reported = True
+                profiler.report()
+        return tutor
@@ -0,0 +1,76 @@
+"""
+AI Tutor - Conversation Retention
+Moves old messages in users.db into the compressed archive table and runs an
+incremental vacuum, either once from the command line (e.g. nightly cron) or on
+a schedule in a background thread (RETENTION_INTERVAL_HOURS, 0 = off).
+
+Usage:
+    python src/memory/retention.py --max-age-days 90
+"""
+
+import os
+import sys
+import argparse
+import threading
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from memory.user_database import UserDatabase, RETENTION_MAX_AGE_DAYS
+
+RETENTION_INTERVAL_HOURS = float(os.getenv("RETENTION_INTERVAL_HOURS", 0))
+
+
+class RetentionScheduler:
+    """Runs UserDatabase.run_retention every `interval_hours` on a daemon thread."""
+
+    def __init__(self, db, interval_hours=None, max_age_days=None):
+        self.db = db
+        self.interval_hours = RETENTION_INTERVAL_HOURS if interval_hours is None else interval_hours
+        self.max_age_days = max_age_days
+        self.stopped = threading.Event()
+        self.thread = None
+        self.last_report = None
+
+    def start(self):
+        """Start the schedule (no-op when the interval is 0). Returns self."""
+        if self.interval_hours > 0 and self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="retention", daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+
+    def _run(self):
+        # First pass right away, then every interval until stopped
+        while not self.stopped.is_set():
+            try:
+                self.last_report = self.db.run_retention(self.max_age_days)
+            except Exception as e:
+                print(f"Retention run failed: {e}")
+            self.stopped.wait(self.interval_hours * 3600)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive old conversations and compact users.db")
+    parser.add_argument("--db-path", help="SQLite file (default: data/users.db)")
+    parser.add_argument("--max-age-days", type=float, default=RETENTION_MAX_AGE_DAYS,
+                        help="Archive messages older than this many days")
+    args = parser.parse_args()
+
+    db = UserDatabase(db_path=args.db_path)
+    report = db.run_retention(args.max_age_days)
+
+    before, after = report["size_before"], report["size_after"]
+    print("=" * 80)
+    print("RETENTION REPORT")
+    print("=" * 80)
+    print(f"Archived messages: {report['archived']['messages']} "
+          f"({report['archived']['archives']} compressed archives)")
+    print(f"Size before: {before['bytes'] / 1024:.1f} KB ({before['free_bytes'] / 1024:.1f} KB free pages)")
+    print(f"Size after:  {after['bytes'] / 1024:.1f} KB ({after['free_bytes'] / 1024:.1f} KB free pages)")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,22 +3,54 @@ User database - SQLite Integration
 Handles user data storage and retrieval using SQLite.
 """
 
+import os
+import gzip
 import sqlite3
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
 
+try:
+    import zstandard
+except ImportError:  # Optional: archives fall back to gzip
+    zstandard = None
+
 PROJECT_ROOT = Path(__file__).parent.parent.parent  # Go up to project root
 DB_PATH = PROJECT_ROOT / "data" / "users.db"
 
+# Messages older than this are moved into the compressed archive table
+RETENTION_MAX_AGE_DAYS = float(os.getenv("RETENTION_MAX_AGE_DAYS", 90))
+# Upper bound on messages per archive row, so one blob never gets huge
+ARCHIVE_BATCH_MESSAGES = int(os.getenv("ARCHIVE_BATCH_MESSAGES", 500))
+# Messages moved per write transaction, so the app's writers never wait long on the lock
+ARCHIVE_TRANSACTION_MESSAGES = int(os.getenv("ARCHIVE_TRANSACTION_MESSAGES", 1000))
+
+
+def _compress(data):
+    """Compress bytes with zstd when available, else gzip. Returns (codec, blob)."""
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=10).compress(data)
+    return "gzip", gzip.compress(data, compresslevel=9)
+
+
+def _decompress(codec, blob):
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("This archive was written with zstd: pip install zstandard")
+        return zstandard.ZstdDecompressor().decompress(blob)
+    return gzip.decompress(blob)
+
+
 class UserDatabase:
     """Manages user data storage and retrieval using SQLite."""
 
-    def __init__(self):
+    def __init__(self, db_path=None):
+        db_path = Path(db_path or DB_PATH)
+
         # Ensure data directory exists
-        DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+        db_path.parent.mkdir(parents=True, exist_ok=True)
         
-        self.db_path = str(DB_PATH)
+        self.db_path = str(db_path)
         self._create_tables()
     
     def _create_tables(self):
@@ -26,6 +58,10 @@ class UserDatabase:
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
 
+        # Let compact() return freed pages to the OS (applies to new databases;
+        # existing ones are converted by their first compact())
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+
         # User table
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS users (
@@ -47,6 +83,33 @@ class UserDatabase:
                 FOREIGN KEY (user_id) REFERENCES users (user_id)
             )
         """)
+
+        # Per-user lookups (history pages, stats) without scanning every conversation
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_conversations_user
+            ON conversations (user_id, conversation_id)
+        """)
+
+        # Archived messages: one compressed JSON list per user and batch
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS conversation_archive (
+                archive_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                first_message_id INTEGER NOT NULL,
+                last_message_id INTEGER NOT NULL,
+                first_timestamp TEXT NOT NULL,
+                last_timestamp TEXT NOT NULL,
+                message_count INTEGER NOT NULL,
+                codec TEXT NOT NULL,
+                payload BLOB NOT NULL,
+                archived_at TEXT NOT NULL,
+                FOREIGN KEY (user_id) REFERENCES users (user_id)
+            )
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_archive_user
+            ON conversation_archive (user_id, first_message_id)
+        """)
         
         conn.commit()
         conn.close()
@@ -80,7 +143,7 @@ class UserDatabase:
         return user_id
     
     def save_message(self, user_id, role, content):
-        """Save a single message to the database."""
+        """Save a single message to the database and return its id."""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
 
@@ -90,9 +153,11 @@ class UserDatabase:
             INSERT INTO conversations (user_id, timestamp, role, content)
             VALUES (?, ?, ?, ?)
         """, (user_id, now, role, content))
+        message_id = cursor.lastrowid
 
         conn.commit()
         conn.close()
+        return message_id
 
     def get_user_history(self, user_id, limit=50):
         """Retrieve conversation history for a user"""
@@ -112,6 +177,35 @@ class UserDatabase:
         # Return messages in chronological order
         return [{"role": row[0], "content": row[1]} for row in reversed(rows)]
     
+    def get_user_history_page(self, user_id, limit=20, before_id=None):
+        """
+        Retrieve one page of conversation history.
+        Returns up to `limit` messages older than `before_id` (latest page when None),
+        in chronological order, each with its id for requesting the next page.
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        if before_id is None:
+            cursor.execute("""
+                SELECT conversation_id, role, content FROM conversations
+                WHERE user_id = ?
+                ORDER BY conversation_id DESC
+                LIMIT ?
+            """, (user_id, limit))
+        else:
+            cursor.execute("""
+                SELECT conversation_id, role, content FROM conversations
+                WHERE user_id = ? AND conversation_id < ?
+                ORDER BY conversation_id DESC
+                LIMIT ?
+            """, (user_id, before_id, limit))
+
+        rows = cursor.fetchall()
+        conn.close()
+
+        return [{"id": row[0], "role": row[1], "content": row[2]} for row in reversed(rows)]
+    
     def clear_user_history(self, user_id):
         """Clear conversation history for a user."""
         conn = sqlite3.connect(self.db_path)
@@ -120,6 +214,9 @@ class UserDatabase:
         cursor.execute("""
             DELETE FROM conversations WHERE user_id = ?
         """, (user_id,))
+        cursor.execute("""
+            DELETE FROM conversation_archive WHERE user_id = ?
+        """, (user_id,))
 
         conn.commit()
         conn.close()
@@ -134,6 +231,12 @@ class UserDatabase:
         """, (user_id,))
 
         count = cursor.fetchone()[0]
+
+        cursor.execute("""
+            SELECT SUM(message_count) FROM conversation_archive WHERE user_id = ?
+        """, (user_id,))
+
+        archived = cursor.fetchone()[0] or 0
         
         cursor.execute("""
             SELECT created_at, last_active FROM users WHERE user_id = ?
@@ -143,14 +246,15 @@ class UserDatabase:
         conn.close()
 
         return {
-            "total_messages": count or 0,
+            "total_messages": (count or 0) + archived,
+            "archived_messages": archived,
             "created_at": user_data[0] if user_data else None,
             "last_active": user_data[1] if user_data else None
         }
     
     def export_conversation(self, user_id, format="txt"):
-        """Export conversation history in specified format (txt or json)."""
-        history = self.get_user_history(user_id, limit=1000)
+        """Export conversation history in specified format (txt or json), archived messages first."""
+        history = self.get_archived_messages(user_id) + self.get_user_history(user_id, limit=1000)
 
         if format == "json":
             return json.dumps(history, indent=4)
@@ -162,4 +266,133 @@ class UserDatabase:
                 role = "Student" if msg["role"] == "user" else "AI Tutor"
                 output += f"{role}: {msg['content']}\n\n"
             
-            return output
\ No newline at end of file
+            return output
+
+    def get_archived_messages(self, user_id):
+        """Decompress a user's archived messages, in chronological order."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            SELECT codec, payload FROM conversation_archive
+            WHERE user_id = ?
+            ORDER BY first_message_id
+        """, (user_id,))
+
+        rows = cursor.fetchall()
+        conn.close()
+
+        messages = []
+        for codec, payload in rows:
+            for msg in json.loads(_decompress(codec, payload)):
+                messages.append({"role": msg["role"], "content": msg["content"]})
+        return messages
+
+    def archive_old_messages(self, max_age_days=None):
+        """
+        Move messages older than max_age_days into conversation_archive,
+        compressed per user in batches of ARCHIVE_BATCH_MESSAGES, committing
+        every ARCHIVE_TRANSACTION_MESSAGES messages.
+        Returns the number of messages and archive rows written.
+        """
+        max_age_days = RETENTION_MAX_AGE_DAYS if max_age_days is None else max_age_days
+        cutoff = (datetime.now() - timedelta(days=max_age_days)).isoformat()
+
+        # Each chunk is selected, archived and deleted under one write lock, so concurrent
+        # runs (several processes, cron + schedule) never archive the same rows twice
+        conn = sqlite3.connect(self.db_path, isolation_level=None, timeout=30)
+        cursor = conn.cursor()
+        totals = {"messages": 0, "archives": 0}
+
+        try:
+            while True:
+                cursor.execute("BEGIN IMMEDIATE")
+                try:
+                    moved = self._archive_rows(cursor, cutoff, ARCHIVE_TRANSACTION_MESSAGES)
+                except Exception:
+                    cursor.execute("ROLLBACK")
+                    raise
+                cursor.execute("COMMIT")
+
+                totals["messages"] += moved["messages"]
+                totals["archives"] += moved["archives"]
+                if moved["messages"] < ARCHIVE_TRANSACTION_MESSAGES:
+                    return totals
+        finally:
+            conn.close()
+
+    def _archive_rows(self, cursor, cutoff, limit):
+        cursor.execute("""
+            SELECT conversation_id, user_id, timestamp, role, content FROM conversations
+            WHERE timestamp < ?
+            ORDER BY user_id, conversation_id
+            LIMIT ?
+        """, (cutoff, limit))
+        rows = cursor.fetchall()
+
+        batches = []
+        for row in rows:
+            if not batches or batches[-1][0][1] != row[1] or len(batches[-1]) >= ARCHIVE_BATCH_MESSAGES:
+                batches.append([])
+            batches[-1].append(row)
+
+        now = datetime.now().isoformat()
+        for batch in batches:
+            payload = json.dumps([
+                {"id": row[0], "timestamp": row[2], "role": row[3], "content": row[4]}
+                for row in batch
+            ]).encode("utf-8")
+            codec, blob = _compress(payload)
+
+            cursor.execute("""
+                INSERT INTO conversation_archive (user_id, first_message_id, last_message_id,
+                    first_timestamp, last_timestamp, message_count, codec, payload, archived_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (batch[0][1], batch[0][0], batch[-1][0], batch[0][2], batch[-1][2],
+                  len(batch), codec, blob, now))
+            cursor.executemany("""
+                DELETE FROM conversations WHERE conversation_id = ?
+            """, [(row[0],) for row in batch])
+
+        return {"messages": len(rows), "archives": len(batches)}
+
+    def database_size(self):
+        """Database size in bytes (allocated pages) and how much of it is free pages."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        page_size = cursor.execute("PRAGMA page_size").fetchone()[0]
+        page_count = cursor.execute("PRAGMA page_count").fetchone()[0]
+        free_pages = cursor.execute("PRAGMA freelist_count").fetchone()[0]
+
+        conn.close()
+        return {"bytes": page_size * page_count, "free_bytes": page_size * free_pages}
+
+    def compact(self):
+        """
+        Return free pages to the OS with an incremental vacuum.
+        Databases created before auto_vacuum was enabled get one full VACUUM to convert them.
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        if cursor.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:  # INCREMENTAL
+            # executescript steps the pragma to completion (execute frees only one page)
+            conn.executescript("PRAGMA incremental_vacuum;")
+        else:
+            print("Converting users.db to incremental auto-vacuum (one-time full VACUUM)...")
+            cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            cursor.execute("VACUUM")
+
+        conn.close()
+
+    def run_retention(self, max_age_days=None):
+        """Archive old messages, then compact. Returns counts and sizes before/after."""
+        before = self.database_size()
+        archived = self.archive_old_messages(max_age_days)
+        self.compact()
+        after = self.database_size()
+
+        print(f"Retention: archived {archived['messages']} messages into {archived['archives']} "
+              f"archives; database {before['bytes'] / 1024:.1f} KB -> {after['bytes'] / 1024:.1f} KB")
+        return {"archived": archived, "size_before": before, "size_after": after}
@@ -0,0 +1,135 @@
+"""
+AI Tutor - Startup Profiler
+Records import and initialization time per component so cold-start
+regressions can be tracked (set STARTUP_PROFILE=1).
+
+Standalone run (fresh process, reports every heavy component):
+    python src/profiling/startup_profiler.py [--json startup.json]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import importlib
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+
+STARTUP_PROFILE = os.getenv("STARTUP_PROFILE", "0") == "1"
+STARTUP_PROFILE_OUTPUT = os.getenv("STARTUP_PROFILE_OUTPUT")
+
+# Heavy modules in dependency order; each time is what that import adds
+# on top of the ones before it (shared dependencies count once).
+HEAVY_MODULES = [
+    "numpy",
+    "torch",
+    "sentence_transformers",
+    "langchain_huggingface",
+    "faiss",
+    "langchain_core",
+    "langchain",
+    "langchain_community.vectorstores",
+    "langchain_groq",
+]
+
+
+class StartupProfiler:
+    """Collects timed steps and milestones relative to process start of profiling."""
+
+    def __init__(self, enabled=STARTUP_PROFILE):
+        self.enabled = enabled
+        self.origin = time.perf_counter()
+        self.steps = []
+        self.milestones = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def track(self, name):
+        """Time a block: `with profiler.track("load FAISS index"): ...`"""
+        if not self.enabled:
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.steps.append({
+                    "step": name,
+                    "seconds": time.perf_counter() - start,
+                    "started_at": start - self.origin,
+                    "thread": threading.current_thread().name,
+                })
+
+    def mark(self, name):
+        """Record the first time a milestone is reached (reruns are ignored)."""
+        if not self.enabled:
+            return
+        with self.lock:
+            self.milestones.setdefault(name, time.perf_counter() - self.origin)
+
+    def import_module(self, module_name):
+        """Import a module, timing it as its own step."""
+        with self.track(f"import {module_name}"):
+            return importlib.import_module(module_name)
+
+    def as_dict(self):
+        with self.lock:
+            return {"steps": list(self.steps), "milestones": dict(self.milestones)}
+
+    def report(self, output_path=None):
+        """Print the profile and optionally write it as JSON."""
+        if not self.enabled:
+            return
+
+        data = self.as_dict()
+
+        print("=" * 80)
+        print("STARTUP PROFILE")
+        print("=" * 80)
+        for step in data["steps"]:
+            print(f"{step['step']:<50} {step['seconds']:>8.3f}s  (at {step['started_at']:.3f}s, {step['thread']})")
+        for name, at in sorted(data["milestones"].items(), key=lambda item: item[1]):
+            print(f"{'milestone: ' + name:<50} {'':>8}   at {at:.3f}s")
+        print("=" * 80)
+
+        output_path = output_path or STARTUP_PROFILE_OUTPUT
+        if output_path:
+            Path(output_path).write_text(json.dumps(data, indent=4), encoding="utf-8")
+            print(f"Startup profile written to {output_path}")
+
+
+# Process-wide profiler shared by app.py and the tutor loader
+profiler = StartupProfiler()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile AI Tutor cold start")
+    parser.add_argument("--json", dest="json_path", help="Write the profile to this file")
+    parser.add_argument("--imports-only", action="store_true",
+                        help="Only time imports, skip model and index loading")
+    args = parser.parse_args()
+
+    profiler.enabled = True
+
+    for module_name in HEAVY_MODULES:
+        try:
+            profiler.import_module(module_name)
+        except ImportError as e:
+            print(f"Skipping {module_name}: {e}")
+
+    if not args.imports_only:
+        sys.path.append(str(Path(__file__).parent.parent))
+        from chains.tutor_loader import load_shared_resources
+
+        with profiler.track("load shared resources (total)"):
+            load_shared_resources()
+
+    profiler.report(args.json_path)
+
+
+if __name__ == "__main__":
+    main()
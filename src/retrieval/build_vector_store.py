@@ -4,14 +4,24 @@ Process NCER documents to create FAISS index for efficient retrieval.
 """
 
 import os 
+import sys
+import argparse
 from pathlib import Path
 from dotenv import load_dotenv
+import numpy as np
 
 # Langchain imports
 from langchain_community.document_loaders import PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
+from langchain_community.docstore.in_memory import InMemoryDocstore
+
+sys.path.append(str(Path(__file__).parent.parent))
+from retrieval import embeddings as embedding_backends
+from retrieval import compression
+from retrieval import chapters as chapter_routing
+from retrieval.query_vectorstore import get_index_version
+from chains.answer_cache import CURATED_QUESTIONS
 
 # Load environment variables
 load_dotenv()
@@ -76,24 +86,83 @@ def chunk_documents(documents, chunk_size=700, chunk_overlap=100):
     print(f"Total chunks created: {len(chunks)}")
     return chunks
 
-def create_embeddings():
+def create_embeddings(backend=None):
     """
-    Create HuggingFace embeddings.
+    Create embeddings for the configured backend (EMBEDDING_BACKEND: huggingface or onnx).
     """
     model_name = os.getenv("EMBEDDING_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2")
-    embeddings = HuggingFaceEmbeddings(model_name=model_name)
+    embeddings = embedding_backends.create_embeddings(backend, model_name=model_name)
     return embeddings
 
-def build_faiss_index(chunks, embeddings, index_path):
+def build_faiss_index(chunks, embeddings, index_path, reduction="none", dim=128, fp16=False):
     """
     Build FAISS index from document chunks and save to disk.
+    With reduction="pca"/"opq" or fp16=True, a projection / compact storage is
+    trained on the chunk vectors and saved inside the index.
     """
-    
-    vectorstore = FAISS.from_documents(chunks, embeddings)
+    texts = [chunk.page_content for chunk in chunks]
+    metadatas = [chunk.metadata for chunk in chunks]
+    vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+
+    description = compression.index_factory_string(reduction, dim=dim, fp16=fp16, n_train=len(vectors))
+    try:
+        index = compression.train_index(vectors, description)
+    except RuntimeError as e:
+        # Too few chunks to train this setting: keep the reduction if PCA can, else store as-is
+        fallback = compression.index_factory_string("pca" if dim < len(vectors) else "none", dim=dim, fp16=fp16)
+        print(f"Cannot train {description} on {len(vectors)} chunks ({e}); falling back to {fallback}.")
+        description = fallback
+        index = compression.train_index(vectors, description)
+
+    vectorstore = FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=InMemoryDocstore(),
+        index_to_docstore_id={},
+    )
+    vectorstore.add_embeddings(zip(texts, vectors.tolist()), metadatas=metadatas)
     vectorstore.save_local(folder_path=index_path)
-    print(f"FAISS index saved to {index_path}")
+    print(f"FAISS index ({description}) saved to {index_path}")
+
+    # Chapter centroids for two-stage retrieval, tied to this index build
+    chapter_index = chapter_routing.build_chapter_index(chunks, vectors)
+    chapter_routing.save_chapter_index(index_path, chapter_index, get_index_version(index_path))
+
+    if description != "Flat":
+        report_compression(vectors, embeddings, index_path, description, dim)
+    else:
+        # Drop the record of an earlier compressed build
+        (Path(index_path) / compression.COMPRESSION_FILE).unlink(missing_ok=True)
+
     return vectorstore
 
+def report_compression(vectors, embeddings, index_path, description, dim, k=10):
+    """
+    Compare index size and recall@k of the built index with other settings,
+    and record the result next to the index.
+    """
+    # Curated student questions plus a sample of chunks as evaluation queries
+    rng = np.random.default_rng(0)
+    sample = vectors[rng.choice(len(vectors), size=min(100, len(vectors)), replace=False)]
+    questions = np.asarray(embeddings.embed_documents(CURATED_QUESTIONS), dtype=np.float32)
+    query_vectors = np.vstack([questions, sample])
+
+    candidates = compression.candidate_descriptions(dim, len(vectors))
+    if description not in candidates:
+        candidates.append(description)
+
+    rows = compression.evaluate_tradeoff(vectors, query_vectors, candidates, k=k)
+    compression.print_tradeoff(rows, chosen=description)
+
+    built = next((row for row in rows if row["index"] == description), None)
+    compression.save_compression_info(index_path, {
+        "index": description,
+        "input_dim": int(vectors.shape[1]),
+        "vectors": int(len(vectors)),
+        "built": built,
+        "tradeoff": rows,
+    })
+
 def test_retrieval(vectorstore, query="Explain quadratic formula", k=3):
     """
     Test retrieval from the vector store.
@@ -113,6 +182,15 @@ def test_retrieval(vectorstore, query="Explain quadratic formula", k=3):
 def main():
     """Main execution pipeline."""
 
+    parser = argparse.ArgumentParser(description="Build the AI Tutor FAISS index")
+    parser.add_argument("--reduction", choices=["none", "pca", "opq"], default=compression.VECTOR_REDUCTION,
+                        help="Projection trained on the chunk vectors (default: VECTOR_REDUCTION)")
+    parser.add_argument("--dim", type=int, default=compression.VECTOR_DIM,
+                        help="Projected dimension for pca/opq (default: VECTOR_DIM)")
+    parser.add_argument("--fp16", action="store_true", default=compression.VECTOR_FP16,
+                        help="Store vectors as float16 (default: VECTOR_FP16)")
+    args = parser.parse_args()
+
     print("="*80)
     print("AI TUTOR = VECTOR STORE BUILDER")
     print("="*80)
@@ -121,14 +199,21 @@ def main():
     print("Loading PDF documents...")
     documents = load_pdfs(PDF_DIR)
 
+    print("Detecting chapters...")
+    documents = chapter_routing.assign_chapters(documents)
+
     print("Chunking documents...")
     chunks = chunk_documents(documents, chunk_size=700, chunk_overlap=100)
+    chunks = chapter_routing.assign_sections(chunks)
 
     print("Creating embeddings...")
     embeddings = create_embeddings()
 
     print("Building FAISS index...")
-    vectorstore = build_faiss_index(chunks, embeddings, str(VECTOR_STORE_DIR))
+    vectorstore = build_faiss_index(
+        chunks, embeddings, str(VECTOR_STORE_DIR),
+        reduction=args.reduction, dim=args.dim, fp16=args.fp16
+    )
 
     print("Testing retrieval...")
     test_retrieval(vectorstore, query="What is the quadratic formula?", k=3)
@@ -0,0 +1,230 @@
+"""
+AI Tutor - Chapter-Level Retrieval Routing
+Derives chapter/section structure from the textbook PDFs and stores one
+centroid embedding per chapter, so a query first picks the closest chapters
+and then searches only their chunks.
+
+Chunks are added to FAISS in reading order, so every chapter is a contiguous
+range of index positions and can be searched with a faiss.IDSelectorRange.
+"""
+
+import re
+import json
+from pathlib import Path
+from collections import defaultdict
+
+import numpy as np
+
+CHAPTERS_FILE = "chapters.json"
+
+# Batched routing searches k * oversample neighbours in one call and keeps the in-chapter ones
+ROUTING_OVERSAMPLE = 8
+
+_CHAPTER_HEADING = re.compile(r"^\s*chapter\s+(\d+)\s*$", re.IGNORECASE | re.MULTILINE)
+_SECTION_HEADING = re.compile(r"^\s*(\d{1,2}\.\d{1,2})\s+([A-Z][^\n]{2,80})$", re.MULTILINE)
+
+
+def _outline_chapters(pdf_path):
+    """(start_page, title) for the top-level PDF outline entries, if the PDF has one."""
+    try:
+        from pypdf import PdfReader
+        reader = PdfReader(pdf_path)
+        chapters = []
+        for item in reader.outline:
+            if isinstance(item, list):  # Nested entries are sections of the previous chapter
+                continue
+            chapters.append((reader.get_destination_page_number(item), item.title.strip()))
+        return sorted(chapters)
+    except Exception as e:
+        print(f"Could not read the outline of {pdf_path}: {e}")
+        return []
+
+
+def _heading_chapters(pages):
+    """(start_page, title) from "CHAPTER n" headings at the top of pages."""
+    chapters = []
+    for page in pages:
+        head = page.page_content[:400]
+        match = _CHAPTER_HEADING.search(head)
+        if not match:
+            continue
+        # The title is the first non-empty line after the heading
+        rest = [line.strip() for line in head[match.end():].splitlines() if line.strip()]
+        title = f"Chapter {match.group(1)}" + (f": {rest[0]}" if rest else "")
+        chapters.append((page.metadata.get("page", 0), title))
+    return chapters
+
+
+def assign_chapters(documents):
+    """
+    Add "chapter" metadata to PDF page documents (from the outline, else from
+    headings, else the whole book as one chapter). Returns the documents.
+    """
+    pages_by_source = defaultdict(list)
+    for doc in documents:
+        pages_by_source[doc.metadata.get("source", "Unknown")].append(doc)
+
+    for source, pages in pages_by_source.items():
+        chapters = _outline_chapters(source) or _heading_chapters(pages)
+        book = Path(source).stem
+
+        if not chapters:
+            print(f"No chapter structure found in {book}, using the whole book.")
+        else:
+            print(f"Found {len(chapters)} chapters in {book}.")
+
+        for page in pages:
+            page_number = page.metadata.get("page", 0)
+            title = book
+            for start, chapter_title in chapters:
+                if start <= page_number:
+                    title = chapter_title
+            page.metadata["chapter"] = title
+
+    return documents
+
+
+def assign_sections(chunks):
+    """Carry the latest "n.m Heading" section forward through each chapter's chunks."""
+    current = {}
+    for chunk in chunks:
+        key = (chunk.metadata.get("source"), chunk.metadata.get("chapter"))
+        headings = [
+            f"{match.group(1)} {match.group(2).strip()}"
+            for match in _SECTION_HEADING.finditer(chunk.page_content)
+        ]
+        # A chunk belongs to the section that was open where it starts
+        section = current.get(key) or (headings[0] if headings else None)
+        if section:
+            chunk.metadata["section"] = section
+        if headings:
+            current[key] = headings[-1]
+    return chunks
+
+
+def build_chapter_index(chunks, vectors):
+    """
+    Group contiguous chunk positions by (source, chapter) and compute centroids.
+    Returns a list of chapter dicts: title, source, ranges, size, centroid.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    chapters = {}
+
+    for position, chunk in enumerate(chunks):
+        key = (chunk.metadata.get("source", "Unknown"), chunk.metadata.get("chapter", "Unknown"))
+        chapter = chapters.setdefault(key, {"title": key[1], "source": key[0], "ranges": []})
+        ranges = chapter["ranges"]
+        if ranges and ranges[-1][1] == position:
+            ranges[-1][1] = position + 1
+        else:
+            ranges.append([position, position + 1])
+
+    for chapter in chapters.values():
+        positions = np.concatenate([np.arange(start, end) for start, end in chapter["ranges"]])
+        centroid = vectors[positions].mean(axis=0)
+        centroid /= max(np.linalg.norm(centroid), 1e-12)
+        chapter["size"] = int(len(positions))
+        chapter["centroid"] = centroid.tolist()
+
+    return list(chapters.values())
+
+
+def save_chapter_index(index_path, chapters, index_version):
+    path = Path(index_path) / CHAPTERS_FILE
+    path.write_text(json.dumps({"index_version": index_version, "chapters": chapters}), encoding="utf-8")
+    print(f"Saved {len(chapters)} chapter centroids to {path}")
+
+
+def load_chapter_index(index_path, index_version):
+    """Chapters for this index build, or None if missing or built for another index."""
+    path = Path(index_path) / CHAPTERS_FILE
+    if not path.exists():
+        return None
+
+    data = json.loads(path.read_text(encoding="utf-8"))
+    if data.get("index_version") != index_version:
+        print(f"Ignoring {path}: it was built for a different index.")
+        return None
+    return data["chapters"]
+
+
+def supports_selectors(index):
+    """
+    Whether searches on this index honour an IDSelector.
+    Flat and scalar-quantized (SQfp16) storage do; PQ/OPQ indexes reject it.
+    """
+    import faiss
+
+    if isinstance(index, faiss.IndexPreTransform):
+        index = faiss.downcast_index(index.index)
+    return isinstance(index, (faiss.IndexFlat, faiss.IndexScalarQuantizer))
+
+
+class ChapterRouter:
+    """Two-stage search: nearest chapter centroids, then a FAISS search restricted to their chunks."""
+
+    def __init__(self, chapters, top_chapters=2):
+        self.chapters = chapters
+        self.top_chapters = top_chapters
+        self.centroids = np.asarray([c["centroid"] for c in chapters], dtype=np.float32)
+
+    def route(self, query_vector, k):
+        """Closest chapters to the query (extended until they hold at least k chunks)."""
+        scores = self.centroids @ np.asarray(query_vector, dtype=np.float32)
+        order = np.argsort(-scores)
+
+        selected, total = [], 0
+        for i in order:
+            selected.append(self.chapters[i])
+            total += self.chapters[i]["size"]
+            if len(selected) >= self.top_chapters and total >= k:
+                break
+        return selected
+
+    @staticmethod
+    def _range_params(index, start, end):
+        """Search parameters restricting ids to [start, end), passed through PCA/OPQ transforms."""
+        import faiss
+
+        params = faiss.SearchParameters(sel=faiss.IDSelectorRange(start, end))
+        if isinstance(index, faiss.IndexPreTransform):
+            params = faiss.SearchParametersPreTransform(index_params=params)
+        return params
+
+    def search(self, index, query_vector, k):
+        """
+        Positions of the k nearest chunks inside the routed chapters, nearest first.
+        Distances are only computed for ids inside each chapter's range.
+        """
+        query = np.asarray([query_vector], dtype=np.float32)
+        candidates = []
+
+        for chapter in self.route(query_vector, k):
+            for start, end in chapter["ranges"]:
+                params = self._range_params(index, start, end)
+                distances, ids = index.search(query, min(k, end - start), params=params)
+                candidates.extend(
+                    (float(d), int(i)) for d, i in zip(distances[0], ids[0]) if i != -1
+                )
+
+        candidates.sort()
+        return [position for _, position in candidates[:k]]
+
+    def search_batch(self, index, query_vectors, k, oversample=ROUTING_OVERSAMPLE):
+        """
+        Routed search for many queries with one multi-query FAISS call:
+        the k * oversample nearest chunks are filtered to each query's chapters.
+        Queries left with fewer than k in-chapter hits fall back to search().
+        """
+        query_matrix = np.asarray(query_vectors, dtype=np.float32)
+        _, ids = index.search(query_matrix, min(k * oversample, index.ntotal))
+
+        results = []
+        for vector, row in zip(query_matrix, ids):
+            ranges = [r for chapter in self.route(vector, k) for r in chapter["ranges"]]
+            hits = [
+                int(i) for i in row
+                if i != -1 and any(start <= i < end for start, end in ranges)
+            ][:k]
+            results.append(hits if len(hits) == k else self.search(index, vector, k))
+        return results
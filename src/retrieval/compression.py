@@ -0,0 +1,189 @@
+"""
+AI Tutor - Compact Vector Representation
+Optional PCA / OPQ projection and float16 storage for the FAISS index.
+
+The projection is trained at build time and stored inside the index as a
+faiss.IndexPreTransform, so every search (including VectorStoreRetriever's)
+applies it to query vectors automatically. A compression.json next to the
+index records the configuration and the size/recall trade-off.
+"""
+
+import os
+import re
+import json
+from pathlib import Path
+
+import numpy as np
+
+COMPRESSION_FILE = "compression.json"
+
+# Defaults for build_vector_store.py (VECTOR_REDUCTION: none, pca or opq)
+VECTOR_REDUCTION = os.getenv("VECTOR_REDUCTION", "none")
+VECTOR_DIM = int(os.getenv("VECTOR_DIM", 128))
+VECTOR_FP16 = os.getenv("VECTOR_FP16", "0") == "1"
+OPQ_SUBQUANTIZERS = int(os.getenv("OPQ_SUBQUANTIZERS", 16))
+
+_OPQ_PATTERN = re.compile(r"^OPQ(\d+)_(\d+),PQ(\d+)x(\d+)$")
+
+
+def index_factory_string(reduction="none", dim=VECTOR_DIM, fp16=False,
+                         opq_m=OPQ_SUBQUANTIZERS, n_train=None):
+    """
+    faiss.index_factory description for a compression setting.
+    pca: PCA projection to `dim`, stored as float32 or float16
+    opq: OPQ rotation to `dim` followed by product quantization with `opq_m` codes
+    """
+    storage = "SQfp16" if fp16 else "Flat"
+
+    if reduction == "none":
+        return storage
+    if reduction == "pca":
+        return f"PCA{dim},{storage}"
+    if reduction == "opq":
+        # 8-bit codebooks need a few thousand training vectors; small corpora use 4 bits
+        nbits = 8 if n_train is None or n_train >= 256 * 16 else 4
+        return f"OPQ{opq_m}_{dim},PQ{opq_m}x{nbits}"
+
+    raise ValueError(f"Unknown vector reduction '{reduction}'. Choose none, pca or opq.")
+
+
+def _opq_index(d, m, dim, nbits):
+    """
+    OPQ rotation + PQ index equivalent to "OPQ{m}_{dim},PQ{m}x{nbits}".
+    index_factory's OPQMatrix always trains its rotation with an 8-bit PQ
+    (256 centroids), which small corpora can't train; use `nbits` there too.
+    """
+    import faiss
+
+    opq = faiss.OPQMatrix(d, m, dim)
+    opq.pq = faiss.ProductQuantizer(dim, m, nbits)
+    return faiss.IndexPreTransform(opq, faiss.IndexPQ(dim, m, nbits))
+
+
+def train_index(vectors, description):
+    """Create and train (but do not fill) an L2 index from a factory string."""
+    import faiss
+
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+
+    opq = _OPQ_PATTERN.match(description)
+    if opq:
+        m, dim, _, nbits = (int(x) for x in opq.groups())
+        index = _opq_index(vectors.shape[1], m, dim, nbits)
+    else:
+        index = faiss.index_factory(vectors.shape[1], description)
+
+    if not index.is_trained:
+        index.train(vectors)
+
+    if opq:
+        # The training PQ is only needed while training; don't keep a borrowed pointer
+        faiss.downcast_VectorTransform(index.chain.at(0)).pq = None
+    return index
+
+
+def index_size_bytes(index):
+    import faiss
+    return int(faiss.serialize_index(index).nbytes)
+
+
+def recall_at_k(index, exact_index, query_vectors, k=10):
+    """Average overlap of the top-k ids with exact float32 search."""
+    k = min(k, exact_index.ntotal)
+    _, exact_ids = exact_index.search(query_vectors, k)
+    _, approx_ids = index.search(query_vectors, k)
+    hits = [len(set(e) & set(a)) / k for e, a in zip(exact_ids, approx_ids)]
+    return float(np.mean(hits))
+
+
+def evaluate_tradeoff(vectors, query_vectors, descriptions, k=10):
+    """
+    Build each candidate index on the corpus vectors and report size and recall@k
+    against an exact IndexFlatL2. Returns a list of dicts.
+    """
+    import faiss
+
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    query_vectors = np.ascontiguousarray(query_vectors, dtype=np.float32)
+
+    exact_index = faiss.IndexFlatL2(vectors.shape[1])
+    exact_index.add(vectors)
+    exact_size = index_size_bytes(exact_index)
+
+    rows = []
+    for description in descriptions:
+        try:
+            index = train_index(vectors, description)
+            index.add(vectors)
+        except RuntimeError as e:
+            print(f"Skipping {description}: {e}")
+            continue
+
+        size = index_size_bytes(index)
+        rows.append({
+            "index": description,
+            "size_bytes": size,
+            "size_ratio": size / exact_size,
+            f"recall_at_{k}": recall_at_k(index, exact_index, query_vectors, k),
+        })
+    return rows
+
+
+def candidate_descriptions(dim, n_train):
+    """Standard settings compared in the build report (dims the corpus can train)."""
+    descriptions = ["Flat", "SQfp16"]
+    for candidate_dim in (64, 128, 192):
+        if candidate_dim < n_train:
+            descriptions.append(f"PCA{candidate_dim},Flat")
+            descriptions.append(f"PCA{candidate_dim},SQfp16")
+    descriptions.append(index_factory_string("opq", dim=dim, n_train=n_train))
+    return descriptions
+
+
+def print_tradeoff(rows, chosen=None):
+    print("\n" + "=" * 80)
+    print("INDEX SIZE VS RECALL")
+    print("=" * 80)
+    for row in rows:
+        recall_key = next(key for key in row if key.startswith("recall_at_"))
+        marker = "  <- built" if row["index"] == chosen else ""
+        print(f"{row['index']:<22} {row['size_bytes'] / 1024:>10.1f} KB "
+              f"({row['size_ratio']:>6.1%})   {recall_key.replace('_', ' ')}: {row[recall_key]:.3f}{marker}")
+    print("=" * 80)
+
+
+def save_compression_info(index_path, info):
+    path = Path(index_path) / COMPRESSION_FILE
+    path.write_text(json.dumps(info, indent=4), encoding="utf-8")
+
+
+def load_compression_info(index_path):
+    """Compression settings of a saved index, or None for a plain float32 index."""
+    path = Path(index_path) / COMPRESSION_FILE
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def test_candidate_descriptions(n_train=202, d=384):
+    """Train every build-report candidate on a corpus the size of the shipped one."""
+    print("=" * 80)
+    print(f" TRAINING COMPRESSION CANDIDATES ({n_train} x {d})")
+    print("=" * 80)
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((n_train, d)).astype(np.float32)
+
+    descriptions = candidate_descriptions(VECTOR_DIM, n_train)
+    descriptions += [index_factory_string(reduction, dim=VECTOR_DIM, fp16=fp16, n_train=n_train)
+                     for reduction in ("pca", "opq") for fp16 in (False, True)]
+
+    for description in dict.fromkeys(descriptions):
+        index = train_index(vectors, description)
+        index.add(vectors)
+        assert index.ntotal == n_train, description
+        print(f"{description:<22} trained OK")
+
+
+if __name__ == "__main__":
+    test_candidate_descriptions()
@@ -0,0 +1,189 @@
+"""
+AI Tutor - Embedding Backends
+Creates the embedding model shared by the index builder and the retriever.
+
+Backends (set EMBEDDING_BACKEND):
+- huggingface : sentence-transformers on PyTorch (default)
+- onnx        : exported ONNX Runtime model, optionally dynamic int8 quantized
+                (needs `pip install onnxruntime` and a one-time export with this script)
+"""
+
+import os
+import json
+from pathlib import Path
+
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+
+# Load environment variables
+load_dotenv()
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+ONNX_MODELS_DIR = PROJECT_ROOT / "data" / "onnx_models"
+
+DEFAULT_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", DEFAULT_MODEL_NAME)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "huggingface")
+ONNX_QUANTIZE = os.getenv("ONNX_QUANTIZE", "1") == "1"
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", 0))  # 0 = ONNX Runtime default
+
+# all-MiniLM-L6-v2 truncates at 256 word pieces in sentence-transformers
+MAX_SEQ_LENGTH = 256
+
+ONNX_FILE = "model.onnx"
+ONNX_INT8_FILE = "model.int8.onnx"
+
+
+def onnx_model_dir(model_name=EMBEDDING_MODEL_NAME):
+    return ONNX_MODELS_DIR / model_name.replace("/", "__")
+
+
+def export_onnx_model(model_name=EMBEDDING_MODEL_NAME, output_dir=None, quantize=True):
+    """
+    Export a sentence-transformers model to ONNX (plus an int8 copy when quantize=True).
+    Needs torch/transformers (installed with sentence-transformers) and onnxruntime.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    output_dir = Path(output_dir or onnx_model_dir(model_name))
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    print(f"Exporting {model_name} to ONNX in {output_dir}...")
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name)
+    model.eval()
+
+    sample = tokenizer(["Export sample sentence"], return_tensors="pt")
+    input_names = ["input_ids", "attention_mask", "token_type_ids"]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"]),
+            str(output_dir / ONNX_FILE),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+        )
+
+    # Fast tokenizer -> tokenizer.json, loaded at query time without transformers
+    tokenizer.save_pretrained(str(output_dir))
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(
+            str(output_dir / ONNX_FILE),
+            str(output_dir / ONNX_INT8_FILE),
+            weight_type=QuantType.QInt8,
+        )
+
+    info = {"model_name": model_name, "quantized": quantize, "max_seq_length": MAX_SEQ_LENGTH}
+    (output_dir / "export_info.json").write_text(json.dumps(info, indent=4), encoding="utf-8")
+
+    print("ONNX export complete.")
+    return output_dir
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Sentence embeddings on ONNX Runtime (CPU).
+    Mean pooling + L2 normalization, matching the sentence-transformers pipeline.
+    """
+
+    def __init__(self, model_dir, quantized=True, num_threads=0, batch_size=32):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_dir = Path(model_dir)
+        model_file = model_dir / (ONNX_INT8_FILE if quantized else ONNX_FILE)
+
+        self.tokenizer = Tokenizer.from_file(str(model_dir / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+            options.inter_op_num_threads = 1
+
+        self.session = ort.InferenceSession(
+            str(model_file), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.batch_size = batch_size
+        self.model_file = model_file
+
+    def _encode(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            inputs["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+        token_embeddings = self.session.run(None, inputs)[0]
+
+        # Mean pooling over real tokens, then normalize
+        mask = attention_mask[..., None].astype(np.float32)
+        summed = (token_embeddings * mask).sum(axis=1)
+        pooled = summed / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return pooled / np.clip(norms, 1e-12, None)
+
+    def embed_documents(self, texts):
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            vectors.extend(self._encode(texts[start:start + self.batch_size]).tolist())
+        return vectors
+
+    def embed_query(self, text):
+        return self._encode([text])[0].tolist()
+
+
+def create_embeddings(backend=None, model_name=None, quantize=None, num_threads=None):
+    """
+    Create the embedding model for the configured backend.
+    """
+    backend = (backend or EMBEDDING_BACKEND).lower()
+    model_name = model_name or EMBEDDING_MODEL_NAME
+
+    if backend == "huggingface":
+        from langchain_huggingface import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(model_name=model_name)
+
+    if backend == "onnx":
+        quantize = ONNX_QUANTIZE if quantize is None else quantize
+        num_threads = EMBEDDING_THREADS if num_threads is None else num_threads
+
+        model_dir = onnx_model_dir(model_name)
+        model_file = model_dir / (ONNX_INT8_FILE if quantize else ONNX_FILE)
+        if not model_file.exists():
+            # Exporting needs torch, which the ONNX backend exists to keep out of serving
+            raise FileNotFoundError(
+                f"No ONNX model at {model_file}. Export it once with: "
+                f"python src/retrieval/embeddings.py --model {model_name}"
+            )
+
+        return OnnxEmbeddings(model_dir, quantized=quantize, num_threads=num_threads)
+
+    raise ValueError(f"Unknown embedding backend '{backend}'. Choose 'huggingface' or 'onnx'.")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export the embedding model to ONNX")
+    parser.add_argument("--model", default=EMBEDDING_MODEL_NAME, help="sentence-transformers model name")
+    parser.add_argument("--no-quantize", action="store_true", help="Skip the int8 copy")
+    args = parser.parse_args()
+
+    export_onnx_model(args.model, quantize=not args.no_quantize)
@@ -3,32 +3,96 @@ AI Tutor - Vector Store Query Interface
 Loads FAISS index and provides retrieval methods
 """
 
+import os
+import sys
+import hashlib
 from pathlib import Path
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS  
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent))
+from profiling.startup_profiler import profiler
 
 # Project paths
 
 PROJECT_ROOT = Path(__file__).parent.parent.parent
 VECTOR_STORE_DIR = PROJECT_ROOT / "data" / "vector_store"   
 
+# Open the index via mmap + SQLite docstore so worker processes share one copy
+VECTOR_STORE_MMAP = os.getenv("VECTOR_STORE_MMAP", "0") == "1"
+
+# Two-stage search: nearest chapter centroids first, then only their chunks
+CHAPTER_ROUTING = os.getenv("CHAPTER_ROUTING", "1") == "1"
+CHAPTER_ROUTING_TOP = int(os.getenv("CHAPTER_ROUTING_TOP", 2))
+
+
+def get_index_version(vector_store_path):
+    """
+    Fingerprint of the saved index files.
+    Changes whenever the vector store is rebuilt, so derived caches can be versioned against it.
+    """
+    digest = hashlib.sha256()
+    for name in ("index.faiss", "index.pkl"):
+        path = Path(vector_store_path) / name
+        if not path.exists():
+            continue
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()[:16]
+
 class VectorStoreRetriever:
     """
     Handles loading and querying the FAISS vector store.
     """
 
-    def __init__(self, vector_store_path=None):
+    def __init__(self, vector_store_path=None, embedding_backend=None, mmap=None):
         self.vector_store_path = vector_store_path or VECTOR_STORE_DIR
+        self.mmap = VECTOR_STORE_MMAP if mmap is None else mmap
 
         print(f"Loading FAISS index from {self.vector_store_path}...")
 
-        self.embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+        # Heavy imports are deferred until a retriever is actually needed
+        with profiler.track("import FAISS vector store"):
+            from langchain_community.vectorstores import FAISS
+            from retrieval.embeddings import create_embeddings
+
+        # Backend from EMBEDDING_BACKEND unless given (huggingface or onnx)
+        with profiler.track("load embedding model"):
+            self.embeddings = create_embeddings(embedding_backend)
+
+        self.index_version = get_index_version(self.vector_store_path)
 
-        self.vectorstore = FAISS.load_local(
-            folder_path=str(self.vector_store_path),
-            embeddings=self.embeddings,
-            allow_dangerous_deserialization=True
-        )
+        with profiler.track("load FAISS index"):
+            if self.mmap:
+                from retrieval.shared_index import load_shared_vectorstore
+                self.vectorstore = load_shared_vectorstore(
+                    self.vector_store_path, self.embeddings, self.index_version
+                )
+            else:
+                self.vectorstore = FAISS.load_local(
+                    folder_path=str(self.vector_store_path),
+                    embeddings=self.embeddings,
+                    allow_dangerous_deserialization=True
+                )
+
+        # PCA/OPQ projections and fp16 storage live inside the index (IndexPreTransform),
+        # so query vectors are projected by FAISS itself on every search
+        from retrieval.compression import load_compression_info
+        self.compression = load_compression_info(self.vector_store_path)
+        if self.compression:
+            print(f"Compressed index: {self.compression['index']} "
+                  f"(from {self.compression['input_dim']}-dim embeddings)")
+
+        # Chapter centroids written by build_vector_store.py for this index build
+        from retrieval.chapters import ChapterRouter, load_chapter_index, supports_selectors
+        self.chapters = load_chapter_index(self.vector_store_path, self.index_version)
+        self.router = None
+        if self.chapters and CHAPTER_ROUTING:
+            if supports_selectors(self.vectorstore.index):
+                self.router = ChapterRouter(self.chapters, top_chapters=CHAPTER_ROUTING_TOP)
+                print(f"Chapter routing over {len(self.chapters)} chapters (top {CHAPTER_ROUTING_TOP}).")
+            else:
+                print("Chapter routing disabled: this index type does not support id selectors.")
         
         print("Vector store loaded successfully.")
 
@@ -38,10 +102,13 @@ class VectorStoreRetriever:
         Retrive relevant documents from the vector store.
         """
 
-        results = self.vectorstore.similarity_search(
-            query,
-            k=k,
-        )
+        if self.router:
+            results = self.search_by_vectors([self.embeddings.embed_query(query)], k=k)[0]
+        else:
+            results = self.vectorstore.similarity_search(
+                query,
+                k=k,
+            )
 
         if filter_subject:
             filtered_results = []
@@ -52,6 +119,58 @@ class VectorStoreRetriever:
             results = filtered_results
         return results
     
+    def retrieve_batch(self, queries, k=3):
+        """
+        Retrieve documents for many queries at once.
+        Embeds all queries in one batched forward pass and runs a single
+        multi-query FAISS search. Returns one list of documents per query.
+        """
+        if not queries:
+            return []
+
+        vectors = self.embeddings.embed_documents(list(queries))
+        return self.search_by_vectors(vectors, k=k)
+
+    def search_by_vectors(self, vectors, k=3):
+        """
+        Search with precomputed query embeddings in a single FAISS call.
+        With chapter routing, a single query uses the exact selector search and
+        several queries share one oversampled search (see ChapterRouter.search_batch).
+        Returns one list of documents per vector.
+        """
+        if len(vectors) == 0:
+            return []
+
+        query_matrix = np.asarray(vectors, dtype=np.float32)
+        index = self.vectorstore.index
+
+        indices = None
+        if self.router:
+            try:
+                if len(query_matrix) == 1:
+                    indices = [self.router.search(index, query_matrix[0], k)]
+                else:
+                    indices = self.router.search_batch(index, query_matrix, k)
+            except RuntimeError as e:
+                # FAISS rejected the routed search; keep serving with the full index
+                print(f"Chapter routing failed ({e}); falling back to full search.")
+                self.router = None
+
+        if indices is None:
+            _, indices = index.search(query_matrix, k)
+
+        return [self._documents_at(row) for row in indices]
+
+    def _documents_at(self, positions):
+        """Documents for FAISS index positions, skipping -1 (fewer than k vectors)."""
+        docs = []
+        for idx in positions:
+            if idx == -1:
+                continue
+            doc_id = self.vectorstore.index_to_docstore_id[int(idx)]
+            docs.append(self.vectorstore.docstore.search(doc_id))
+        return docs
+    
     def retrieve_with_scores(self, query, k=3):
         # This is a one-liner - FAISS provides this method
         results_with_scores = self.vectorstore.similarity_search_with_score(query, k=k)
@@ -67,8 +186,15 @@ class VectorStoreRetriever:
 
             source = doc.metadata.get('source', 'Unknown').split('/')[-1]
             page = doc.metadata.get('page', 'Unknown')
+            chapter = doc.metadata.get('chapter')
+            section = doc.metadata.get('section')
 
-            context_block = f"Source: {source}, Page: {page}\nContent: {doc.page_content}\n"
+            header = f"Source: {source}, Page: {page}"
+            if chapter:
+                header += f", Chapter: {chapter}"
+            if section:
+                header += f", Section: {section}"
+            context_block = f"{header}\nContent: {doc.page_content}\n"
             context_parts.append(context_block)
         final_context = "\n---\n".join(context_parts)
         return final_context
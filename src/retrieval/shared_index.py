@@ -0,0 +1,154 @@
+"""
+AI Tutor - Shared Read-Only Vector Store
+Opens the FAISS index through mmap and serves documents from a read-only
+SQLite docstore, so several worker processes share one copy of both in the
+OS page cache instead of each unpickling a private copy (VECTOR_STORE_MMAP=1).
+"""
+
+import os
+import json
+import pickle
+import sqlite3
+import threading
+from pathlib import Path
+from collections.abc import Mapping
+
+from langchain_community.docstore.base import Docstore
+from langchain_core.documents import Document
+
+DOCSTORE_FILE = "docstore.db"
+
+
+def export_sqlite_docstore(vector_store_path, index_version):
+    """
+    Write the pickled docstore (index.pkl) to docstore.db, once per index build.
+    Returns the SQLite path.
+    """
+    vector_store_path = Path(vector_store_path)
+    db_path = vector_store_path / DOCSTORE_FILE
+
+    if db_path.exists() and _stored_version(db_path) == index_version:
+        return db_path
+
+    print(f"Exporting docstore to {db_path}...")
+
+    with open(vector_store_path / "index.pkl", "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+
+    tmp_path = db_path.with_name(f"{DOCSTORE_FILE}.{os.getpid()}.tmp")
+    conn = sqlite3.connect(tmp_path)
+    conn.execute("""
+        CREATE TABLE documents (
+            position INTEGER PRIMARY KEY,
+            doc_id TEXT UNIQUE NOT NULL,
+            page_content TEXT NOT NULL,
+            metadata TEXT NOT NULL
+        )
+    """)
+    conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+    rows = []
+    for position, doc_id in index_to_docstore_id.items():
+        doc = docstore.search(doc_id)
+        rows.append((int(position), doc_id, doc.page_content, json.dumps(doc.metadata)))
+    conn.executemany("INSERT INTO documents VALUES (?, ?, ?, ?)", rows)
+    conn.execute("INSERT INTO meta VALUES ('index_version', ?)", (index_version,))
+    conn.commit()
+    conn.close()
+
+    os.replace(tmp_path, db_path)
+    print(f"Exported {len(rows)} documents.")
+    return db_path
+
+
+def _stored_version(db_path):
+    try:
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        row = conn.execute("SELECT value FROM meta WHERE key = 'index_version'").fetchone()
+        conn.close()
+        return row[0] if row else None
+    except sqlite3.Error:
+        return None
+
+
+class _ReadOnlyConnections:
+    """One read-only SQLite connection per thread."""
+
+    def __init__(self, db_path):
+        self.uri = f"file:{db_path}?mode=ro&immutable=1"
+        self.local = threading.local()
+
+    def get(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.uri, uri=True)
+            self.local.conn = conn
+        return conn
+
+
+class SqliteDocstore(Docstore):
+    """Read-only docstore over docstore.db (documents are not held in process memory)."""
+
+    def __init__(self, connections):
+        self.connections = connections
+
+    def search(self, search):
+        row = self.connections.get().execute(
+            "SELECT page_content, metadata FROM documents WHERE doc_id = ?", (search,)
+        ).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return Document(page_content=row[0], metadata=json.loads(row[1]))
+
+
+class SqliteIdMap(Mapping):
+    """Read-only FAISS position -> docstore id mapping over docstore.db."""
+
+    def __init__(self, connections):
+        self.connections = connections
+
+    def __getitem__(self, position):
+        row = self.connections.get().execute(
+            "SELECT doc_id FROM documents WHERE position = ?", (int(position),)
+        ).fetchone()
+        if row is None:
+            raise KeyError(position)
+        return row[0]
+
+    def __iter__(self):
+        for (position,) in self.connections.get().execute("SELECT position FROM documents ORDER BY position"):
+            yield position
+
+    def __len__(self):
+        return self.connections.get().execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+
+def read_index_mmap(index_file):
+    """
+    Read a FAISS index memory-mapped and read-only.
+    IO_FLAG_MMAP_IFC (faiss >= 1.10) maps flat vector codes without copying;
+    older builds fall back to IO_FLAG_MMAP.
+    """
+    import faiss
+
+    mmap_flag = getattr(faiss, "IO_FLAG_MMAP_IFC", None)
+    if mmap_flag is None:
+        print("This faiss build has no IO_FLAG_MMAP_IFC; flat vectors may still be copied per process.")
+        mmap_flag = faiss.IO_FLAG_MMAP
+
+    return faiss.read_index(str(index_file), mmap_flag | faiss.IO_FLAG_READ_ONLY)
+
+
+def load_shared_vectorstore(vector_store_path, embeddings, index_version):
+    """LangChain FAISS vector store over the mmap'd index and the SQLite docstore."""
+    from langchain_community.vectorstores import FAISS
+
+    db_path = export_sqlite_docstore(vector_store_path, index_version)
+    connections = _ReadOnlyConnections(db_path)
+
+    return FAISS(
+        embedding_function=embeddings,
+        index=read_index_mmap(Path(vector_store_path) / "index.faiss"),
+        docstore=SqliteDocstore(connections),
+        index_to_docstore_id=SqliteIdMap(connections),
+    )
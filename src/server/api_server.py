@@ -0,0 +1,433 @@
+"""
+AI Tutor - Headless Tutoring API Server
+Serves one warm model (LLM client, embeddings, FAISS index) to any number of
+front ends, independent of Streamlit's rerun model.
+
+Model calls (ask, stream, retrieve) run on a fixed worker pool behind a bounded
+queue; when the queue is full the server answers 503 with Retry-After instead of
+piling up work (backpressure). History endpoints go straight to UserDatabase.
+
+Usage:
+    python src/server/api_server.py --port 8000 --workers 4 --queue-size 32
+
+Endpoints (JSON):
+    GET    /health
+    POST   /users                      {"username"}            -> {"user_id"}
+    POST   /ask                        {"user_id", "question"} -> {"answer"}
+    POST   /ask/stream                 {"user_id", "question"} -> NDJSON {"token"} ... {"done", "answer"}
+    POST   /retrieve                   {"query", "k"}          -> {"documents", "context"}
+    POST   /sessions/<id>/clear        clears the tutor's conversation memory
+    GET    /users/<id>/history?limit=  -> {"messages"}
+    GET    /users/<id>/history/page?limit=&before_id= -> {"messages"} (with ids)
+    POST   /users/<id>/messages        {"role", "content"}     -> {"id"}
+    DELETE /users/<id>/history
+    GET    /users/<id>/stats
+    GET    /users/<id>/export?format=txt|json
+"""
+
+import os
+import re
+import sys
+import json
+import queue
+import argparse
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from urllib.parse import urlparse, parse_qs
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(str(Path(__file__).parent.parent))
+from chains.tutor_loader import load_shared_resources
+from memory.user_database import UserDatabase
+from memory.retention import RetentionScheduler
+
+API_HOST = os.getenv("API_HOST", "127.0.0.1")
+API_PORT = int(os.getenv("API_PORT", 8000))
+API_WORKERS = int(os.getenv("API_WORKERS", 4))
+API_QUEUE_SIZE = int(os.getenv("API_QUEUE_SIZE", 32))
+API_MAX_SESSIONS = int(os.getenv("API_MAX_SESSIONS", 1000))
+API_REQUEST_TIMEOUT = float(os.getenv("API_REQUEST_TIMEOUT", 120))
+
+_STREAM_END = object()
+
+
+class ServerBusy(Exception):
+    """Raised when the worker queue is full."""
+
+
+class TutorService:
+    """
+    Shared model tier: one set of model resources, per-user conversation
+    sessions and a bounded worker pool for model calls.
+    """
+
+    def __init__(self, workers=API_WORKERS, queue_size=API_QUEUE_SIZE,
+                 max_sessions=API_MAX_SESSIONS, resources=None, db=None):
+        self.resources = resources or load_shared_resources()
+        self.db = db or UserDatabase()
+
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tutor-worker")
+        # Running + waiting model calls; beyond this requests are rejected
+        self.capacity = threading.BoundedSemaphore(workers + queue_size)
+        self.workers = workers
+        self.queue_size = queue_size
+
+        self.max_sessions = max_sessions
+        self.sessions = OrderedDict()
+        self.sessions_lock = threading.Lock()
+
+        self.stats_lock = threading.Lock()
+        self.in_flight = 0
+        self.rejected = 0
+
+    # Sessions
+
+    def get_tutor(self, user_id):
+        """Conversation session for a user (least recently used sessions are evicted)."""
+        from chains.tutor_chain import AITutor
+
+        with self.sessions_lock:
+            session = self.sessions.get(user_id)
+            if session is None:
+                session = {"tutor": AITutor(**self.resources), "lock": threading.Lock()}
+                self.sessions[user_id] = session
+                while len(self.sessions) > self.max_sessions:
+                    self.sessions.popitem(last=False)
+            self.sessions.move_to_end(user_id)
+            return session
+
+    def clear_session(self, user_id):
+        with self.sessions_lock:
+            session = self.sessions.get(user_id)
+        if session:
+            session["tutor"].clear_history()
+
+    # Worker pool
+
+    def submit(self, fn, *args):
+        """Run a model call on the worker pool, or raise ServerBusy if the queue is full."""
+        if not self.capacity.acquire(blocking=False):
+            with self.stats_lock:
+                self.rejected += 1
+            raise ServerBusy()
+
+        with self.stats_lock:
+            self.in_flight += 1
+
+        def run():
+            try:
+                return fn(*args)
+            finally:
+                with self.stats_lock:
+                    self.in_flight -= 1
+                self.capacity.release()
+
+        return self.pool.submit(run)
+
+    def ask(self, user_id, question):
+        session = self.get_tutor(user_id)
+
+        def run():
+            # One turn at a time per conversation
+            with session["lock"]:
+                return session["tutor"].ask(question)
+
+        return self.submit(run).result(timeout=API_REQUEST_TIMEOUT)
+
+    def stream(self, user_id, question):
+        """
+        Yield answer tokens produced on a worker thread. Closing the generator
+        (client gone) or timing out stops the worker, which frees the session
+        lock and the pool slot instead of generating an answer nobody reads.
+        """
+        session = self.get_tutor(user_id)
+        tokens = queue.Queue()
+        cancelled = threading.Event()
+
+        def run():
+            try:
+                with session["lock"]:
+                    if cancelled.is_set():  # Gave up while queued
+                        return
+                    answer = session["tutor"].stream(question)
+                    try:
+                        for token in answer:
+                            if cancelled.is_set():
+                                break
+                            tokens.put(token)
+                    finally:
+                        answer.close()
+            except Exception as e:
+                tokens.put(e)
+            finally:
+                tokens.put(_STREAM_END)
+
+        self.submit(run)
+
+        try:
+            while True:
+                try:
+                    item = tokens.get(timeout=API_REQUEST_TIMEOUT)
+                except queue.Empty:
+                    raise TimeoutError("No tokens from the tutor within the request timeout")
+                if item is _STREAM_END:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            cancelled.set()
+
+    def retrieve(self, query, k=3):
+        retriever = self.resources["retriever"]
+
+        def run():
+            docs = retriever.retrieve(query, k=k)
+            return docs, retriever.get_context(query, k=k)
+
+        docs, context = self.submit(run).result(timeout=API_REQUEST_TIMEOUT)
+        return {
+            "documents": [{"page_content": d.page_content, "metadata": d.metadata} for d in docs],
+            "context": context,
+        }
+
+    def health(self):
+        with self.stats_lock:
+            in_flight, rejected = self.in_flight, self.rejected
+        return {
+            "status": "ok",
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "in_flight": in_flight,
+            "queued": max(0, in_flight - self.workers),
+            "rejected": rejected,
+            "sessions": len(self.sessions),
+            "single_flight": self.resources["single_flight"].stats(),
+            "llm_circuit": self.resources["circuit_breaker"].stats(),
+        }
+
+
+class TutorRequestHandler(BaseHTTPRequestHandler):
+    """JSON routes over TutorService (set as the `service` class attribute)."""
+
+    protocol_version = "HTTP/1.1"
+    service = None
+
+    USER_ROUTE = re.compile(r"^/users/(\d+)/(history/page|history|messages|stats|export)$")
+    SESSION_ROUTE = re.compile(r"^/sessions/(\d+)/clear$")
+
+    def log_message(self, format, *args):
+        if os.getenv("API_ACCESS_LOG", "0") == "1":
+            super().log_message(format, *args)
+
+    # Helpers
+
+    def _read_body(self):
+        # Always drain the body so keep-alive connections stay in sync
+        length = int(self.headers.get("Content-Length") or 0)
+        self.body = self.rfile.read(length) if length else b""
+
+    def _read_json(self):
+        if not self.body:
+            return {}
+        return json.loads(self.body.decode("utf-8"))
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_busy(self):
+        self._send_json(503, {"error": "Server busy, retry shortly"}, {"Retry-After": "1"})
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _dispatch(self, method):
+        parsed = urlparse(self.path)
+        query = parse_qs(parsed.query)
+        self._read_body()
+        try:
+            self._route(method, parsed.path, query)
+        except ServerBusy:
+            self._send_busy()
+        except (KeyError, ValueError, json.JSONDecodeError) as e:
+            self._send_json(400, {"error": f"Bad request: {e}"})
+        except (TimeoutError, FutureTimeout):  # Distinct classes before Python 3.11
+            self._send_json(504, {"error": "Timed out waiting for the tutor"})
+        except Exception as e:
+            print(f"Error handling {method} {parsed.path}: {e}")
+            self._send_json(500, {"error": str(e)})
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    # Routes
+
+    def _route(self, method, path, query):
+        service = self.service
+
+        if method == "GET" and path == "/health":
+            return self._send_json(200, service.health())
+
+        if method == "POST" and path == "/users":
+            user_id = service.db.create_user(self._read_json()["username"])
+            return self._send_json(200, {"user_id": user_id})
+
+        if method == "POST" and path == "/ask":
+            data = self._read_json()
+            answer = service.ask(int(data["user_id"]), data["question"])
+            if answer is None:
+                return self._send_json(500, {"error": "Error processing the question"})
+            return self._send_json(200, {"answer": answer})
+
+        if method == "POST" and path == "/ask/stream":
+            data = self._read_json()
+            return self._stream_answer(int(data["user_id"]), data["question"])
+
+        if method == "POST" and path == "/retrieve":
+            data = self._read_json()
+            return self._send_json(200, service.retrieve(data["query"], int(data.get("k", 3))))
+
+        match = self.SESSION_ROUTE.match(path)
+        if match and method == "POST":
+            service.clear_session(int(match.group(1)))
+            return self._send_json(200, {"cleared": True})
+
+        match = self.USER_ROUTE.match(path)
+        if match:
+            return self._user_route(method, int(match.group(1)), match.group(2), query)
+
+        self._send_json(404, {"error": f"No route for {method} {path}"})
+
+    def _user_route(self, method, user_id, resource, query):
+        db = self.service.db
+
+        if resource == "history" and method == "GET":
+            limit = int(query.get("limit", ["50"])[0])
+            return self._send_json(200, {"messages": db.get_user_history(user_id, limit=limit)})
+
+        if resource == "history/page" and method == "GET":
+            limit = int(query.get("limit", ["20"])[0])
+            before_id = query.get("before_id", [None])[0]
+            messages = db.get_user_history_page(
+                user_id, limit=limit, before_id=int(before_id) if before_id else None
+            )
+            return self._send_json(200, {"messages": messages})
+
+        if resource == "history" and method == "DELETE":
+            db.clear_user_history(user_id)
+            return self._send_json(200, {"cleared": True})
+
+        if resource == "messages" and method == "POST":
+            data = self._read_json()
+            message_id = db.save_message(user_id, data["role"], data["content"])
+            return self._send_json(200, {"id": message_id})
+
+        if resource == "stats" and method == "GET":
+            return self._send_json(200, db.get_user_stats(user_id))
+
+        if resource == "export" and method == "GET":
+            export_format = query.get("format", ["txt"])[0]
+            return self._send_json(200, {"export": db.export_conversation(user_id, format=export_format)})
+
+        self._send_json(405, {"error": f"{method} not allowed on {resource}"})
+
+    def _stream_answer(self, user_id, question):
+        """NDJSON over chunked transfer encoding: one {"token"} line per chunk."""
+        tokens = self.service.stream(user_id, question)
+
+        # Fail fast with a normal status if the queue is full or the first token errors
+        first = next(tokens, None)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        parts = []
+        try:
+            if first is not None:
+                parts.append(first)
+                self._write_chunk((json.dumps({"token": first}) + "\n").encode("utf-8"))
+            for token in tokens:
+                parts.append(token)
+                self._write_chunk((json.dumps({"token": token}) + "\n").encode("utf-8"))
+            final = {"done": True, "answer": "".join(parts)}
+        except (BrokenPipeError, ConnectionResetError):
+            # Client disconnected: stop generating and don't write a trailer to a dead socket
+            self.close_connection = True
+            return
+        except Exception as e:
+            print(f"Error while streaming: {e}")
+            final = {"done": True, "error": str(e)}
+        finally:
+            tokens.close()
+
+        self._write_chunk((json.dumps(final) + "\n").encode("utf-8"))
+        self._write_chunk(b"")
+
+
+def make_http_server(service, host=API_HOST, port=API_PORT, sock=None):
+    """
+    HTTP server bound to host:port, or serving an already-listening socket
+    (used by the prefork launcher so workers share one port).
+    """
+    handler = type("BoundTutorRequestHandler", (TutorRequestHandler,), {"service": service})
+
+    if sock is None:
+        server = ThreadingHTTPServer((host, port), handler)
+    else:
+        server = ThreadingHTTPServer(sock.getsockname()[:2], handler, bind_and_activate=False)
+        server.socket.close()
+        server.socket = sock
+
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AI Tutor API server")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument("--workers", type=int, default=API_WORKERS, help="Concurrent model calls")
+    parser.add_argument("--queue-size", type=int, default=API_QUEUE_SIZE,
+                        help="Model calls allowed to wait before returning 503")
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("AI TUTOR - API SERVER")
+    print("=" * 80)
+
+    service = TutorService(workers=args.workers, queue_size=args.queue_size)
+    server = make_http_server(service, args.host, args.port)
+
+    # Archive old conversations and vacuum users.db every RETENTION_INTERVAL_HOURS
+    RetentionScheduler(service.db).start()
+
+    print(f"Serving on http://{args.host}:{args.port} "
+          f"({args.workers} workers, queue {args.queue_size})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Shutting down.")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
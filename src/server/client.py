@@ -0,0 +1,118 @@
+"""
+AI Tutor - API Client
+Thin HTTP clients that mirror AITutor and UserDatabase, so app.py can run
+as a UI-only front end of a separate tutoring API server (TUTOR_API_URL).
+"""
+
+import json
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+API_CLIENT_TIMEOUT = 180
+BUSY_RETRIES = 3
+
+
+class TutorAPIError(Exception):
+    """Raised when the API server returns an error."""
+
+
+def _request(base_url, method, path, payload=None, timeout=API_CLIENT_TIMEOUT, stream=False):
+    """Send a JSON request; retries briefly when the server signals backpressure (503)."""
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+
+    for attempt in range(BUSY_RETRIES + 1):
+        request = urllib.request.Request(
+            base_url.rstrip("/") + path,
+            data=data,
+            method=method,
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            response = urllib.request.urlopen(request, timeout=timeout)
+            if stream:
+                return response
+            with response:
+                return json.loads(response.read().decode("utf-8"))
+        except urllib.error.HTTPError as e:
+            if e.code == 503 and attempt < BUSY_RETRIES:
+                time.sleep(float(e.headers.get("Retry-After", 1)))
+                continue
+            try:
+                message = json.loads(e.read().decode("utf-8")).get("error", str(e))
+            except (ValueError, OSError):
+                message = str(e)
+            raise TutorAPIError(f"{method} {path} failed ({e.code}): {message}") from e
+
+
+class TutorClient:
+    """AITutor-compatible client for one user's session on the API server."""
+
+    def __init__(self, base_url, user_id):
+        self.base_url = base_url
+        self.user_id = user_id
+
+    def ask(self, question):
+        """Ask a question; returns None on failure like AITutor.ask."""
+        try:
+            response = _request(self.base_url, "POST", "/ask",
+                                {"user_id": self.user_id, "question": question})
+            return response["answer"]
+        except (TutorAPIError, OSError) as e:
+            print(f"Error during remote ask: {e}")
+            return None
+
+    def stream(self, question):
+        """Yield answer tokens as the server streams them."""
+        response = _request(self.base_url, "POST", "/ask/stream",
+                            {"user_id": self.user_id, "question": question}, stream=True)
+        with response:
+            for line in response:
+                if not line.strip():
+                    continue
+                event = json.loads(line.decode("utf-8"))
+                if "token" in event:
+                    yield event["token"]
+                elif event.get("error"):
+                    raise TutorAPIError(event["error"])
+
+    def retrieve(self, query, k=3):
+        return _request(self.base_url, "POST", "/retrieve", {"query": query, "k": k})
+
+    def clear_history(self):
+        _request(self.base_url, "POST", f"/sessions/{self.user_id}/clear")
+
+
+class RemoteUserDatabase:
+    """UserDatabase-compatible client backed by the API server's database."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+
+    def create_user(self, username):
+        return _request(self.base_url, "POST", "/users", {"username": username})["user_id"]
+
+    def save_message(self, user_id, role, content):
+        return _request(self.base_url, "POST", f"/users/{user_id}/messages",
+                        {"role": role, "content": content})["id"]
+
+    def get_user_history(self, user_id, limit=50):
+        return _request(self.base_url, "GET", f"/users/{user_id}/history?limit={int(limit)}")["messages"]
+
+    def get_user_history_page(self, user_id, limit=20, before_id=None):
+        params = {"limit": int(limit)}
+        if before_id is not None:
+            params["before_id"] = int(before_id)
+        query = urllib.parse.urlencode(params)
+        return _request(self.base_url, "GET", f"/users/{user_id}/history/page?{query}")["messages"]
+
+    def clear_user_history(self, user_id):
+        _request(self.base_url, "DELETE", f"/users/{user_id}/history")
+
+    def get_user_stats(self, user_id):
+        return _request(self.base_url, "GET", f"/users/{user_id}/stats")
+
+    def export_conversation(self, user_id, format="txt"):
+        query = urllib.parse.urlencode({"format": format})
+        return _request(self.base_url, "GET", f"/users/{user_id}/export?{query}")["export"]
@@ -0,0 +1,274 @@
+"""
+AI Tutor - Prefork Worker Launcher
+Runs several API server processes on one port. The parent binds the socket and
+exports the shared docstore, then forks workers that each open the FAISS index
+read-only through mmap, so the index and documents are shared in the OS page
+cache and each extra worker adds almost no resident memory for them.
+
+Usage (Linux/macOS):
+    python src/server/prefork.py --processes 4 --port 8000 --workers 4
+"""
+
+import os
+import sys
+import time
+import select
+import signal
+import socket
+import argparse
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from server.api_server import API_HOST, API_PORT, API_WORKERS, API_QUEUE_SIZE
+
+PREFORK_PROCESSES = int(os.getenv("PREFORK_PROCESSES", 2))
+
+
+def prepare_shared_index():
+    """Export the SQLite docstore once in the parent so workers never race to build it."""
+    from retrieval.query_vectorstore import VECTOR_STORE_DIR, get_index_version
+    from retrieval.shared_index import export_sqlite_docstore
+
+    export_sqlite_docstore(VECTOR_STORE_DIR, get_index_version(VECTOR_STORE_DIR))
+
+
+def bind_socket(host, port, backlog=128):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    return sock
+
+
+def worker_memory(pid):
+    """Memory of a process in MB from /proc (Rss, Pss and the private part)."""
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                    fields[parts[0][:-1]] = int(parts[1]) / 1024
+    except OSError:
+        return None
+
+    return {
+        "rss_mb": fields.get("Rss", 0.0),
+        "pss_mb": fields.get("Pss", 0.0),
+        "shared_mb": fields.get("Shared_Clean", 0.0) + fields.get("Shared_Dirty", 0.0),
+        "private_mb": fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0),
+    }
+
+
+def run_worker(sock, ready_fd, workers, queue_size):
+    """Child process: load shared resources with mmap and serve on the inherited socket."""
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    from chains.tutor_loader import load_shared_resources
+    from server.api_server import TutorService, make_http_server
+
+    service = TutorService(
+        workers=workers,
+        queue_size=queue_size,
+        resources=load_shared_resources(mmap=True),
+    )
+    server = make_http_server(service, sock=sock)
+
+    if ready_fd is not None:  # Respawned workers are not waited for
+        os.write(ready_fd, b"1")
+        os.close(ready_fd)
+
+    print(f"Worker {os.getpid()} ready.")
+    server.serve_forever()
+
+
+class PreforkLauncher:
+    """Forks, supervises and respawns API server worker processes."""
+
+    def __init__(self, processes, host, port, workers, queue_size):
+        self.processes = processes
+        self.workers = workers
+        self.queue_size = queue_size
+        self.sock = bind_socket(host, port)
+        self.children = set()
+        self.stopping = False
+        self.ready_r, self.ready_w = os.pipe()
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            if self.ready_r is not None:
+                os.close(self.ready_r)
+            try:
+                run_worker(self.sock, self.ready_w, self.workers, self.queue_size)
+            finally:
+                os._exit(1)
+        self.children.add(pid)
+        return pid
+
+    def close_ready_pipe(self):
+        for fd in (self.ready_r, self.ready_w):
+            if fd is not None:
+                os.close(fd)
+        self.ready_r = self.ready_w = None
+
+    def stop(self, signum=None, frame=None):
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def wait_until_ready(self, poll_interval=0.5):
+        """
+        Block until every worker has loaded its resources.
+        Raises RuntimeError if a worker exits during startup or the launcher is stopped.
+        """
+        # Only the workers hold the write end now, so EOF means they have all exited
+        os.close(self.ready_w)
+        self.ready_w = None
+
+        ready = 0
+        while ready < self.processes:
+            if self.stopping:
+                raise RuntimeError("Stopped while workers were starting")
+
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid:
+                self.children.discard(pid)
+                raise RuntimeError(f"Worker {pid} exited during startup (status {status})")
+
+            readable, _, _ = select.select([self.ready_r], [], [], poll_interval)
+            if readable:
+                data = os.read(self.ready_r, self.processes - ready)
+                if not data:
+                    if self.stopping:
+                        raise RuntimeError("Stopped while workers were starting")
+                    raise RuntimeError("All workers exited during startup")
+                ready += len(data)
+
+    def _reap_all(self):
+        while self.children:
+            try:
+                pid, _ = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            self.children.discard(pid)
+
+    def report_memory(self):
+        print("=" * 80)
+        print("WORKER MEMORY (MB)  - shared pages are counted once in Pss")
+        print("=" * 80)
+        for pid in sorted(self.children):
+            memory = worker_memory(pid)
+            if memory is None:
+                print(f"Worker {pid}: /proc not available")
+                continue
+            print(f"Worker {pid}: Rss {memory['rss_mb']:.1f} | Pss {memory['pss_mb']:.1f} | "
+                  f"shared {memory['shared_mb']:.1f} | private {memory['private_mb']:.1f}")
+        print("=" * 80)
+
+    def run(self, report_memory=True):
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+
+        for _ in range(self.processes):
+            self.spawn()
+
+        try:
+            self.wait_until_ready()
+        except RuntimeError as e:
+            print(f"Startup failed: {e}")
+            self.stop()
+            self._reap_all()
+            self.sock.close()
+            raise SystemExit(1)
+        finally:
+            self.close_ready_pipe()
+
+        print(f"All {self.processes} workers ready on {self.sock.getsockname()}.")
+        if report_memory:
+            self.report_memory()
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+
+            self.children.discard(pid)
+            if not self.stopping:
+                print(f"Worker {pid} exited (status {status}), respawning...")
+                time.sleep(1)
+                self.spawn()
+
+        self.sock.close()
+        print("All workers stopped.")
+
+
+def test_worker_exits_before_ready():
+    """One worker dies while loading: the launcher must exit with status 1, not wait forever."""
+    global run_worker
+    original = run_worker
+
+    def fake_worker(sock, ready_fd, workers, queue_size):
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        if len(launcher.children) == 0:  # First worker: loads "forever"
+            time.sleep(60)
+        # Second worker: exits without ever writing to the ready pipe
+
+    launcher = PreforkLauncher(2, "127.0.0.1", 0, workers=1, queue_size=1)
+    run_worker = fake_worker
+    started = time.monotonic()
+    try:
+        launcher.run(report_memory=False)
+        raise AssertionError("launcher started although a worker exited")
+    except SystemExit as e:
+        assert e.code == 1, e.code
+    finally:
+        run_worker = original
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    elapsed = time.monotonic() - started
+    assert elapsed < 10, f"startup failure took {elapsed:.1f}s to detect"
+    assert not launcher.children, f"workers left running: {launcher.children}"
+    print(f"Worker exit before ready detected in {elapsed:.1f}s; all workers reaped.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run several AI Tutor API workers sharing one mmap'd index")
+    parser.add_argument("--processes", type=int, default=PREFORK_PROCESSES, help="Worker processes")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument("--workers", type=int, default=API_WORKERS, help="Model threads per process")
+    parser.add_argument("--queue-size", type=int, default=API_QUEUE_SIZE, help="Queued calls per process")
+    parser.add_argument("--no-memory-report", action="store_true")
+    parser.add_argument("--self-test", action="store_true", help="Check startup failure handling and exit")
+    args = parser.parse_args()
+
+    if not hasattr(os, "fork"):
+        sys.exit("The prefork launcher needs os.fork (Linux/macOS); run api_server.py directly instead.")
+
+    if args.self_test:
+        test_worker_exits_before_ready()
+        return
+
+    print("=" * 80)
+    print("AI TUTOR - PREFORK LAUNCHER")
+    print("=" * 80)
+
+    prepare_shared_index()
+
+    launcher = PreforkLauncher(args.processes, args.host, args.port, args.workers, args.queue_size)
+    launcher.run(report_memory=not args.no_memory_report)
+
+
+if __name__ == "__main__":
+    main()